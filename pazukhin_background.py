@@ -0,0 +1,145 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pazukhin_geometry as geometry
+
+
+class FrozenWorld:
+    """Неизменяемая копия мира на один тик: только числа, без игровых объектов,
+    поэтому её можно отдать потоку или процессу
+    """
+
+    def __init__(self, snapshot, params, formation_quantum, field):
+        self.tick = snapshot.tick
+        self.field = field
+        self.shot_distance = params.shot_distance
+        self.formation = (params.shot_distance + params.attack_distance_offset,
+                          params.attack_angle, params.attack_angle_step)
+        self.formation_quantum = formation_quantum
+        base = snapshot.my_mothership
+        self.base = (base.x, base.y)
+        self.enemy_drones = tuple((drone.id, drone.x, drone.y, drone.my_mothership.id)
+                                  for drone in snapshot.enemies['drones'])
+        self.enemy_motherships = tuple((mothership.id, mothership.x, mothership.y)
+                                       for mothership in snapshot.enemies['motherships'])
+        self.loot = tuple((obj.id, obj.x, obj.y) for obj in snapshot.tracker.loot)
+
+
+class Plan:
+    """Результат фонового планирования для одного тика
+
+    on_fire - находится ли объект добычи под огнём, protected - под защитой ли противник,
+    attack_positions - построения нападения по округлённому положению противника.
+    """
+
+    def __init__(self, tick, on_fire, protected, attack_positions):
+        self.tick = tick
+        self.on_fire = on_fire
+        self.protected = protected
+        self.attack_positions = attack_positions
+
+
+def compute_plan(world):
+    """Считаем план по замороженному миру, функция не трогает игровые объекты
+
+    :return: plan
+    """
+    on_fire = {}
+    for obj_id, x, y in world.loot:
+        on_fire[obj_id] = any(math.hypot(x - ex, y - ey) <= world.shot_distance
+                              for _, ex, ey, _ in world.enemy_drones)
+    protected = {}
+    motherships = {mothership_id: (x, y) for mothership_id, x, y in world.enemy_motherships}
+    for drone_id, x, y, mothership_id in world.enemy_drones:
+        base = motherships.get(mothership_id)
+        protected[drone_id] = base is not None and 50 < math.hypot(x - base[0], y - base[1]) <= 300
+    for mothership_id, x, y in world.enemy_motherships:
+        protected[mothership_id] = any(own_id == mothership_id and 50 < math.hypot(ex - x, ey - y) <= 350
+                                       for _, ex, ey, own_id in world.enemy_drones)
+    attack_positions = {}
+    quantum = world.formation_quantum
+    for _, x, y, _ in world.enemy_drones:
+        key = (round(x / quantum) * quantum, round(y / quantum) * quantum)
+        if key not in attack_positions:
+            attack_positions[key] = geometry.attack_formation(key[0], key[1], world.base[0], world.base[1],
+                                                              *world.formation, *world.field)
+    return Plan(world.tick, on_fire, protected, attack_positions)
+
+
+class BackgroundPlanner:
+    """Фоновый планировщик с двойной буферизацией
+
+    Пока рабочий поток (или процесс) считает следующий план по замороженному миру,
+    обработчики событий читают последний готовый план. План старше max_staleness тиков
+    не выдаётся, и вызывающий код считает всё синхронно, как без планировщика.
+    Режим process требует недемонического процесса: демоническим (например, рабочим
+    multiprocessing.Pool) нельзя заводить дочерние, и тогда конструктор бросает RuntimeError,
+    а не подменяет процесс потоком.
+    """
+
+    def __init__(self, mode='thread', max_staleness=5):
+        if mode == 'process' and multiprocessing.current_process().daemon:
+            raise RuntimeError('Фоновое планирование в процессе невозможно в демоническом процессе {}'.format(
+                multiprocessing.current_process().name))
+        self.mode = mode
+        self.max_staleness = max_staleness
+        if mode == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=1)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pazukhin-planner')
+        self.latest = None
+        self.pending = None
+        self.plans = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    def poll(self):
+        """Забираем готовый план, если рабочий его досчитал"""
+        if self.pending is not None and self.pending.done():
+            future = self.pending
+            self.pending = None
+            if future.exception() is None:
+                self.latest = future.result()
+                self.plans += 1
+
+    def submit(self, world):
+        """Отдаём рабочему новый замороженный мир, если он свободен
+
+        :return: boolean, принят ли мир в работу
+        """
+        self.poll()
+        if self.pending is not None:
+            return False
+        self.pending = self.executor.submit(compute_plan, world)
+        return True
+
+    def get(self, tick):
+        """Последний готовый план, если он не старше max_staleness тиков
+
+        :return: plan или None
+        """
+        self.poll()
+        self.requests += 1
+        plan = self.latest
+        if plan is None or tick - plan.tick > self.max_staleness:
+            self.fallbacks += 1
+            return None
+        return plan
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        """Статистика планировщика: fallback_ratio - доля запросов плана,
+        на которые плана не нашлось и решение считалось синхронно
+
+        :return: dict
+        """
+        return {
+            'mode': self.mode,
+            'plans': self.plans,
+            'requests': self.requests,
+            'fallbacks': self.fallbacks,
+            'fallback_ratio': round(self.fallbacks / self.requests, 4) if self.requests else None,
+        }
@@ -0,0 +1,345 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import statistics
+import time
+
+from pazukhin_headless import ENGINES, load_class, select_engine
+from pazukhin_profiling import LatencyHistogram
+
+BENCHMARKS = (
+    'check_nearest_object_with_etherium', 'get_object_with_etherium', 'check_firing_line',
+    'get_attack_positions', 'search_nearest_enemy', 'check_enemy_on_protection',
+)
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+# Режим большого поля и многих команд: решения, которые зависят от числа противников и баз
+FIELD_BENCHMARKS = ('check_enemy_on_protection', 'search_nearest_enemy', 'get_attack_positions')
+DEFAULT_SCALES = (1, 2, 4, 8)
+DEFAULT_TEAMS = (2, 4, 8, 16)
+BASELINES = {
+    suite: os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for suite, name in (('sizes', 'pazukhin_benchmark_baseline.json'),
+                        ('field', 'pazukhin_benchmark_field_baseline.json'))
+}
+
+
+class SyntheticScene:
+    """Искусственная сцена на классах замены движка: asteroids астероидов, enemies вражеских дронов
+    teams - 1 команд и наша команда из team_size дронов у своей базы
+
+    Доля guard_share вражеских дронов стоит у своих баз (часть из них - под защитой),
+    остальные разбросаны по полю. Десятая часть вражеских дронов - обломки с ресурсом.
+    """
+    base_size = 20
+    base_field = 1200
+
+    @classmethod
+    def of_size(cls, bot_class, size, team_size=5, seed=1):
+        """Сцена из size астероидов и size вражеских дронов трёх команд.
+        Поле растёт вместе с size так, чтобы плотность объектов была как в обычной игре
+        (20 астероидов на поле 1200 x 1200). Размер нашей команды не растёт: в игре он ограничен правилами
+
+        :return: scene
+        """
+        side = int(cls.base_field * math.sqrt(max(size, cls.base_size) / cls.base_size))
+        return cls(bot_class, size, size, 4, side, team_size, seed)
+
+    @classmethod
+    def of_field(cls, bot_class, scale, teams, team_size=5, seed=1):
+        """Поле в scale раз больше обычного по каждой стороне с обычной плотностью астероидов
+        и teams командами по team_size дронов, половина вражеских дронов - у своих баз
+
+        :return: scene
+        """
+        return cls(bot_class, cls.base_size * scale * scale, (teams - 1) * team_size, teams,
+                   cls.base_field * scale, team_size, seed, guard_share=0.5)
+
+    def __init__(self, bot_class, asteroids, enemies, teams, side, team_size=5, seed=1, guard_share=0.0):
+        from astrobox.core import Drone
+        from astrobox.space_field import SpaceField
+        from robogame_engine.geometry import Point
+        from robogame_engine.theme import theme
+        self.size = asteroids
+        rng = random.Random(seed)
+        random.seed(seed)
+        theme.TEAMS_COUNT = max(theme.TEAMS_COUNT, teams)
+        self.scene = SpaceField(field=(side, side), can_fight=True, headless=True)
+        self.drones = [bot_class() for _ in range(team_size)]
+        enemy_classes = [type('BenchmarkEnemy{}'.format(i), (Drone,), {}) for i in range(teams - 1)]
+        self.enemies = [enemy_classes[i % len(enemy_classes)]() for i in range(enemies)]
+        self.scene.prepare(asteroids_count=asteroids, max_drones_at_team=max(team_size, enemies))
+        margin = 100
+        guards = int(enemies * guard_share)
+        for drone in self.drones:
+            base = drone.my_mothership
+            drone.coord = Point(base.x + rng.uniform(0, 300), base.y + rng.uniform(0, 300))
+        for i, enemy in enumerate(self.enemies):
+            if i < guards:
+                base = enemy.my_mothership
+                enemy.coord = Point(min(max(base.x + rng.uniform(-350, 350), margin), side - margin),
+                                    min(max(base.y + rng.uniform(-350, 350), margin), side - margin))
+            else:
+                enemy.coord = Point(rng.uniform(margin, side - margin), rng.uniform(margin, side - margin))
+            if i % 10 == 9:
+                set_payload(enemy, 50)
+                enemy.damage_taken(enemy.health)
+        self.scene._step = 1
+        for drone in self.drones:
+            drone.on_born()
+            drone.update_info()
+        self.discard_commands()
+
+    def discard_commands(self):
+        """Команды дронов не выполняются, сцена остаётся неизменной"""
+        for drone in self.drones:
+            clear_queue(drone._commands)
+        for obj in self.scene.objects:
+            clear_queue(obj._events)
+
+    def next_tick(self):
+        """Новый тик: кэши тика у команды и у дронов считаются заново"""
+        self.scene._step += 1
+
+
+def set_payload(obj, payload):
+    """Кладём ресурс в трюм объекта: у замены движка payload трюма можно присвоить,
+    у astrobox ресурс меняется только переносом, поэтому пишем в его закрытое поле"""
+    cargo = obj.cargo
+    try:
+        cargo.payload = payload
+    except AttributeError:
+        cargo._Cargo__payload = payload
+
+
+def clear_queue(queue):
+    """Очищаем очередь команд или событий: deque у замены движка, queue.Queue у robogame_engine"""
+    getattr(queue, 'queue', queue).clear()
+
+
+def make_call(name, scene, drone, index):
+    """Вызов помощника с аргументами, которые берёт для него бот
+
+    :return: function
+    """
+    enemies = scene.enemies
+    enemy = enemies[(index * 7919) % len(enemies)] if enemies else None
+    if name == 'check_firing_line':
+        return lambda: drone.check_firing_line(enemy, drone.coord)
+    if name in ('get_attack_positions', 'check_enemy_on_protection'):
+        if name == 'check_enemy_on_protection' and index % 4 == 0:
+            # Проверяем и базы, у них своя ветка
+            enemy = drone.enemies['motherships'][index % len(drone.enemies['motherships'])]
+        method = getattr(drone, name)
+        return lambda: method(enemy)
+    return getattr(drone, name)
+
+
+def run_benchmark(scene, name, min_rounds=3, max_rounds=200, min_time=0.3, warm=False):
+    """Прогоняем помощник name у всех наших дронов, каждый раунд - новый тик.
+    Раунды повторяются, пока не набрано min_rounds и min_time секунд.
+    С warm снимок мира тика строится до замера и его стоимость считается отдельно (tick_refresh_us),
+    так виден чистый расход на одно решение
+
+    :return: dict с задержкой вызова и пропускной способностью
+    """
+    histogram = LatencyHistogram()
+    refresh = LatencyHistogram()
+    rounds = 0
+    started = time.perf_counter()
+    while rounds < max_rounds and (rounds < min_rounds or time.perf_counter() - started < min_time):
+        scene.next_tick()
+        if warm:
+            refresh_started = time.perf_counter()
+            scene.drones[0].get_snapshot()
+            refresh.add(time.perf_counter() - refresh_started)
+        for i, drone in enumerate(scene.drones):
+            call = make_call(name, scene, drone, rounds * len(scene.drones) + i)
+            call_started = time.perf_counter()
+            call()
+            histogram.add(time.perf_counter() - call_started)
+        scene.discard_commands()
+        rounds += 1
+    mean = histogram.total / histogram.count
+    result = {
+        'calls': histogram.count,
+        'mean_us': round(mean * 1.e6, 2),
+        'p50_us': round(histogram.percentile(0.5) * 1.e6, 2),
+        'max_us': round(histogram.max * 1.e6, 2),
+        'calls_per_s': round(1 / mean, 1) if mean else None,
+    }
+    if warm:
+        result['tick_refresh_us'] = round(refresh.total / refresh.count * 1.e6, 2)
+    return result
+
+
+def run_repeated(scene, name, repeats=5, **kwargs):
+    """Повторяем замер repeats раз и берём повтор с медианной средней задержкой.
+    noise - разброс средних между повторами относительно медианы, по нему compare
+    отличает замедление от шума машины
+
+    :return: dict как у run_benchmark и median_us, repeats_us, noise
+    """
+    runs = sorted((run_benchmark(scene, name, **kwargs) for _ in range(repeats)), key=lambda run: run['mean_us'])
+    result = dict(runs[len(runs) // 2])
+    means = [run['mean_us'] for run in runs]
+    result['median_us'] = statistics.median(means)
+    result['repeats_us'] = means
+    result['noise'] = round((means[-1] - means[0]) / result['median_us'], 3) if result['median_us'] else 0.0
+    return result
+
+
+def scaling_exponent(sizes, times):
+    """Показатель степени k в зависимости время ~ size ** k, наклон прямой в логарифмах
+
+    :return: float или None
+    """
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, times) if value > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return round(sum((x - mean_x) * (y - mean_y) for x, y in points) / spread, 2)
+
+
+def run_suite(bot_class, sizes=DEFAULT_SIZES, names=BENCHMARKS, team_size=5, seed=1, min_time=0.3, repeats=5):
+    """Все помощники на сценах всех размеров
+
+    :return: dict: results[name][size], scaling[name]
+    """
+    results = {name: {} for name in names}
+    for size in sizes:
+        scene = SyntheticScene.of_size(bot_class, size, team_size, seed)
+        for name in names:
+            stat = results[name][str(size)] = run_repeated(scene, name, repeats, min_time=min_time)
+            print('{:<36}{:>8}{:>12.1f} us{:>12.0f} calls/s  noise {:.2f}'.format(
+                name, size, stat['median_us'], stat['calls_per_s'], stat['noise']), file=sys.stderr)
+    scaling = {name: scaling_exponent(sizes, [results[name][str(size)]['median_us'] for size in sizes])
+               for name in names}
+    return {'sizes': list(sizes), 'team_size': team_size, 'results': results, 'scaling': scaling}
+
+
+def run_field_suite(bot_class, scales=DEFAULT_SCALES, team_counts=DEFAULT_TEAMS, names=FIELD_BENCHMARKS,
+                    team_size=5, seed=1, min_time=0.3, repeats=5):
+    """Помощники на полях разного размера с разным числом команд, снимок мира строится вне замера.
+    flatness - во сколько раз самый дорогой сценарий дороже самого дешёвого
+
+    :return: dict: results[name]['<scale>x<teams>'], flatness[name]
+    """
+    results = {name: {} for name in names}
+    scenarios = []
+    for scale in scales:
+        for teams in team_counts:
+            scenario = '{}x{}'.format(scale, teams)
+            scenarios.append(scenario)
+            scene = SyntheticScene.of_field(bot_class, scale, teams, team_size, seed)
+            for name in names:
+                stat = results[name][scenario] = run_repeated(scene, name, repeats, min_time=min_time, warm=True)
+                print('{:<36}{:>8}{:>12.1f} us  refresh {:>10.1f} us  objects {}  noise {:.2f}'.format(
+                    name, scenario, stat['median_us'], stat['tick_refresh_us'], len(scene.scene.objects),
+                    stat['noise']), file=sys.stderr)
+    flatness = {}
+    for name in names:
+        means = [stat['median_us'] for stat in results[name].values()]
+        flatness[name] = round(max(means) / min(means), 2)
+    return {'scenarios': scenarios, 'team_size': team_size, 'results': results, 'flatness': flatness}
+
+
+def compare(report, baseline, max_ratio=1.5):
+    """Сравниваем с сохранённым базовым прогоном по медиане повторов средней задержки вызова.
+    Порог регрессии - max_ratio, но не меньше 1 + шум обоих прогонов: на шумной машине
+    разброс повторов сам по себе даёт такие отношения
+
+    :return: список (name, size, ratio, limit), отсортированный по убыванию ratio; ratio > limit - регрессия
+    """
+    ratios = []
+    for name, by_size in report['results'].items():
+        for size, stat in by_size.items():
+            base = baseline.get('results', {}).get(name, {}).get(size)
+            if base and base['median_us']:
+                limit = round(max(max_ratio, 1 + stat['noise'] + base['noise']), 2)
+                ratios.append((name, size, round(stat['median_us'] / base['median_us'], 2), limit))
+    ratios.sort(key=lambda item: -item[2])
+    return ratios
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Замеры помощников дрона на искусственных сценах разного размера')
+    parser.add_argument('--bot', default='pazukhin_p_o:drone_class')
+    parser.add_argument('--engine', choices=ENGINES, default='standin',
+                        help='движок сцен; astrobox - только набор sizes, больше четырёх команд он не допускает')
+    parser.add_argument('--suite', choices=sorted(BASELINES), default='sizes',
+                        help='sizes - число объектов, field - размер поля и число команд')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='число астероидов и вражеских дронов в сценах')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help='во сколько раз поле больше обычного (--suite field)')
+    parser.add_argument('--teams', type=int, nargs='+', default=list(DEFAULT_TEAMS),
+                        help='число команд (--suite field)')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=None)
+    parser.add_argument('--team-size', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--min-time', type=float, default=0.3, help='наименьшее время замера одного помощника')
+    parser.add_argument('--repeats', type=int, default=5, help='число повторов замера, сравнивается медиана')
+    parser.add_argument('--baseline', default=None,
+                        help='файл базового прогона для сравнения, по умолчанию - сохранённый для набора')
+    parser.add_argument('--save-baseline', action='store_true', help='записать этот прогон как базовый')
+    parser.add_argument('--max-ratio', type=float, default=1.5,
+                        help='во сколько раз медленнее - регрессия, если это больше шума повторов')
+    parser.add_argument('--output', help='файл JSON для результатов')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    engine = select_engine(args.engine)
+    if args.suite == 'field' and engine != 'standin':
+        raise SystemExit('Набор field строит поля до 16 команд, он идёт только на замене движка')
+    bot_class = load_class(args.bot)
+    if args.suite == 'field':
+        report = run_field_suite(bot_class, args.scales, args.teams, args.only or FIELD_BENCHMARKS,
+                                 args.team_size, args.seed, args.min_time, args.repeats)
+    else:
+        report = run_suite(bot_class, args.sizes, args.only or BENCHMARKS, args.team_size, args.seed, args.min_time,
+                           args.repeats)
+    report['engine'] = engine
+    report['repeats'] = args.repeats
+    args.baseline = args.baseline or BASELINES[args.suite]
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if args.suite == 'field':
+        print('flatness (slowest / fastest scenario):')
+        for name, ratio in report['flatness'].items():
+            print('  {:<36}{}'.format(name, ratio))
+    else:
+        print('scaling (time ~ size ** k):')
+        for name, exponent in report['scaling'].items():
+            print('  {:<36}{}'.format(name, exponent))
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        print('baseline saved to {}'.format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        if baseline.get('engine') != engine:
+            # Замеры на разных движках несравнимы
+            print('baseline {} was measured on {}, this run on {}: not compared'.format(
+                args.baseline, baseline.get('engine'), engine))
+            return 0
+        ratios = compare(report, baseline, args.max_ratio)
+        print('compared with {} (current / baseline, limit):'.format(args.baseline))
+        for name, size, ratio, limit in ratios:
+            mark = '  REGRESSION' if ratio > limit else ''
+            print('  {:<36}{:>8}{:>8.2f}{:>8.2f}{}'.format(name, size, ratio, limit, mark))
+        regressions = [item for item in ratios if item[2] > item[3]]
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
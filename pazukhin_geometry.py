@@ -0,0 +1,71 @@
+import math
+
+
+def from_points(x1, y1, x2, y2, module=None):
+    """Вектор из точки (x1, y1) в точку (x2, y2), при заданном module - приведённый к этой длине
+
+    :return: x, y
+    """
+    x = float(x2 - x1)
+    y = float(y2 - y1)
+    if module:
+        current_module = math.hypot(x, y)
+        if current_module:
+            x *= module / current_module
+            y *= module / current_module
+    return x, y
+
+
+def rotate(x, y, angle):
+    """Поворачиваем вектор на angle градусов против часовой стрелки
+
+    :return: x, y
+    """
+    rad = math.radians(angle)
+    cos = math.cos(rad)
+    sin = math.sin(rad)
+    return x * cos - y * sin, x * sin + y * cos
+
+
+def distance(x1, y1, x2, y2):
+    """Расстояние между точками
+
+    :return: distance
+    """
+    return math.hypot(x2 - x1, y2 - y1)
+
+
+def heading_miss(x, y, direction, target_x, target_y):
+    """На каком расстоянии от точки (target_x, target_y) пройдёт луч из (x, y) по курсу direction градусов
+
+    :return: distance, бесконечность для точки позади
+    """
+    rad = math.radians(direction)
+    dx, dy = target_x - x, target_y - y
+    along = dx * math.cos(rad) + dy * math.sin(rad)
+    if along < 0:
+        return math.inf
+    return abs(dy * math.cos(rad) - dx * math.sin(rad))
+
+
+def attack_formation(enemy_x, enemy_y, base_x, base_y, distance, angle=24, angle_step=6,
+                     width=1200, height=1200, margin=50):
+    """Точки нападения на противника в точке (enemy_x, enemy_y) веером от направления на нашу базу
+    на расстоянии около distance, отсортированные по удалению от базы.
+    Точки ближе margin к краю поля width x height отбрасываются
+
+    :return: список x, y
+    """
+    positions = []
+    distances = [20, 15, 10, 5, 0, 5, 10, 15, 20]
+    for dis in distances:
+        vec_x, vec_y = from_points(enemy_x, enemy_y, base_x, base_y, distance + dis)
+        vec_x, vec_y = rotate(vec_x, vec_y, angle)
+        x, y = enemy_x + vec_x, enemy_y + vec_y
+        distance_to_base = math.hypot(x - base_x, y - base_y)
+        if margin <= int(x) < width - margin and margin <= int(y) < height - margin \
+                and not distance_to_base < 100:
+            positions.append((distance_to_base, x, y))
+        angle -= angle_step
+    positions.sort()
+    return [(x, y) for _, x, y in positions]
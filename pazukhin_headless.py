@@ -0,0 +1,287 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pazukhin_profiling
+import pazukhin_recording
+
+ENGINES = ('auto', 'astrobox', 'standin')
+
+
+class ErrorCounter(logging.Handler):
+    """Считает ошибки в обработчиках событий, которые движок пишет в лог robogame"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        if record.name.startswith('robogame'):
+            self.count += 1
+
+
+def select_engine(engine='auto'):
+    """Подключаем настоящий astrobox или локальную замену, если движка нет или она запрошена явно
+
+    :return: имя подключённого движка
+    """
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    if engine in ('auto', 'astrobox'):
+        try:
+            importlib.import_module('astrobox.space_field')
+            return 'astrobox'
+        except ImportError:
+            if engine == 'astrobox':
+                raise
+    import pazukhin_standin
+    pazukhin_standin.install()
+    return 'standin'
+
+
+def load_class(path):
+    """Загружаем класс дрона по строке вида 'module:attr'
+
+    :return: class
+    """
+    module_name, _, attr = path.partition(':')
+    return getattr(importlib.import_module(module_name), attr or 'drone_class')
+
+
+def play_match(match):
+    """Играем один матч без графики в текущем процессе
+
+    Движок хранит команды на уровне класса сцены, поэтому в одном процессе играется один матч.
+
+    :param match: dict с параметрами матча
+    :return: dict с результатами матча
+    """
+    engine = select_engine(match['engine'])
+    random.seed(match['seed'])
+    from astrobox.space_field import SpaceField
+    bot_class = load_class(match['bot'])
+    opponent_class = load_class(match['opponent'])
+    if opponent_class is bot_class:
+        # Команда определяется по имени класса, для зеркального матча нужен другой класс
+        opponent_class = type('Mirror' + bot_class.__name__, (bot_class,), {})
+    if match.get('params'):
+        bot_class.params = bot_class.params.replace(**match['params'])
+    if match.get('background'):
+        bot_class.background_planning = match['background']
+    if match.get('telemetry'):
+        bot_class.telemetry_path = match['telemetry']
+    profiler = None
+    if match.get('profile'):
+        profiler = pazukhin_profiling.instrument(
+            bot_class, pazukhin_profiling.Profiler(slow_tick_ms=match.get('slow_tick_ms')))
+    counter = ErrorCounter()
+    logging.getLogger().addHandler(counter)
+    scene = SpaceField(field=tuple(match['field']), speed=1, asteroids_count=match['asteroids'],
+                       can_fight=match['can_fight'], headless=True)
+    recorder = None
+    if match.get('record'):
+        recorder = pazukhin_recording.Recorder(match['record']).attach(scene)
+    for _ in range(match['drones']):
+        bot_class()
+    for _ in range(match['drones']):
+        opponent_class()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            result = scene.go()
+        finally:
+            if recorder is not None:
+                recorder.close()
+            # Дописываем телеметрию и останавливаем фоновых планировщиков команд
+            for team_state in list(getattr(bot_class, 'team_states', {}).values()):
+                team_state.close()
+    wall_time = time.perf_counter() - started
+    logging.getLogger().removeHandler(counter)
+    errors = counter.count + len(getattr(scene, 'errors', ()))
+    collected = result.get('collected', {})
+    team = bot_class.__name__
+    elerium = collected.get(team, 0)
+    best = max(collected.values()) if collected else 0
+    leaders = [name for name, value in collected.items() if value == best]
+    winner = leaders[0] if len(leaders) == 1 else None
+    won = winner == team
+    steps = result.get('game_steps')
+    team_state = getattr(bot_class, 'team_states', {}).get(team)
+    report = {
+        'seed': match['seed'],
+        'engine': engine,
+        'collected': collected,
+        'elerium': elerium,
+        'winner': winner,
+        'won': won,
+        'game_steps': result.get('game_steps'),
+        'ticks_to_win': result.get('game_steps') if won else None,
+        'wall_time': round(wall_time, 3),
+        'dead': result.get('dead', {}),
+        'errors': errors,
+        'elerium_per_tick': round(elerium / steps, 4) if steps else None,
+    }
+    if team_state is not None:
+        report['team'] = team_state.stats()
+        # Цена распределения астероидов по команде в пересчёте на тик игры
+        report['planner_ms_per_tick'] = round(report['team']['assignment']['solve_ms'] / steps, 4) if steps else None
+        if 'planner' in report['team']:
+            # Доля решений, посчитанных синхронно, потому что фонового плана не было или он устарел
+            report['fallback_ratio'] = report['team']['planner']['fallback_ratio']
+    if match.get('tag') is not None:
+        report['tag'] = match['tag']
+    if recorder is not None:
+        report['recording'] = match['record']
+    if profiler is not None:
+        report['profile'] = profiler.summary()
+    return report
+
+
+def run_batch(matches, workers=None):
+    """Играем матчи параллельно, каждый матч в свежем процессе.
+    Рабочие ProcessPoolExecutor не демонические, поэтому фоновый планировщик в режиме process
+    может завести в них свой процесс (рабочим multiprocessing.Pool это запрещено)
+
+    :return: генератор результатов в порядке завершения
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers or os.cpu_count(), mp_context=context, max_tasks_per_child=1) as executor:
+        futures = [executor.submit(play_match, match) for match in matches]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def load_params(path):
+    """Читаем параметры стратегии из файла JSON, например лучшую конфигурацию подбора
+
+    :return: dict или None
+    """
+    if not path:
+        return None
+    with open(path) as source:
+        return json.load(source)
+
+
+def make_matches(args):
+    """Список параметров матчей по аргументам командной строки
+
+    :return: list
+    """
+    return [{
+        'seed': args.seed + i,
+        'engine': args.engine,
+        'bot': args.bot,
+        'opponent': args.opponent,
+        'drones': args.drones,
+        'asteroids': args.asteroids,
+        'field': args.field,
+        'can_fight': not args.peaceful,
+        'profile': args.profile,
+        'slow_tick_ms': args.slow_tick_ms,
+        'background': args.background,
+        'params': load_params(args.params),
+        'telemetry': os.path.join(args.telemetry, 'telemetry_{}_{{team}}.{}'.format(
+            args.seed + i, args.telemetry_format)) if args.telemetry else None,
+        'record': os.path.join(args.record, 'match_{}.pzr'.format(args.seed + i)) if args.record else None,
+    } for i in range(args.matches)]
+
+
+def summarize(results):
+    """Сводка по серии матчей
+
+    :return: dict
+    """
+    results = list(results)
+    wins = [result for result in results if result['won']]
+    ticks = sorted(result['ticks_to_win'] for result in wins)
+    steps = sum(result['game_steps'] or 0 for result in results)
+    solve_ms = sum(result['team']['assignment']['solve_ms'] for result in results if 'team' in result)
+    planners = [result['team']['planner'] for result in results if 'planner' in result.get('team', {})]
+    requests = sum(planner['requests'] for planner in planners)
+    return {
+        'matches': len(results),
+        'wins': len(wins),
+        'elerium': sum(result['elerium'] for result in results),
+        'median_ticks_to_win': ticks[len(ticks) // 2] if ticks else None,
+        'elerium_per_tick': round(sum(result['elerium'] for result in results) / steps, 4) if steps else None,
+        'planner_ms_per_tick': round(solve_ms / steps, 4) if steps else None,
+        'fallback_ratio': round(sum(planner['fallbacks'] for planner in planners) / requests, 4) if requests else None,
+        'wall_time': round(sum(result['wall_time'] for result in results), 3),
+        'errors': sum(result['errors'] for result in results),
+    }
+
+
+def print_profile(profile):
+    """Печатаем таблицу задержек по методам за матч"""
+    print('  {:<36}{:>8}{:>10}{:>10}{:>10}'.format('method', 'calls', 'p50 ms', 'p99 ms', 'max ms'))
+    for name, stat in sorted(profile['methods'].items(), key=lambda item: -item[1]['total_ms']):
+        print('  {:<36}{calls:>8}{p50_ms:>10.3f}{p99_ms:>10.3f}{max_ms:>10.3f}'.format(name, **stat))
+    ticks = profile['ticks']
+    print('  ticks p50={p50_ms:.3f}ms p99={p99_ms:.3f}ms max={max_ms:.3f}ms'.format(**ticks),
+          'slow={}'.format(profile['slow_ticks']))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетный прогон матчей astrobox без графики')
+    parser.add_argument('--matches', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1, help='зерно первого матча, дальше по возрастанию')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--bot', default='pazukhin_p_o:drone_class')
+    parser.add_argument('--opponent', default='pazukhin_opponents:drone_class')
+    parser.add_argument('--drones', type=int, default=5)
+    parser.add_argument('--asteroids', type=int, default=20)
+    parser.add_argument('--field', type=int, nargs=2, default=(1200, 1200))
+    parser.add_argument('--engine', choices=ENGINES, default='auto')
+    parser.add_argument('--peaceful', action='store_true', help='матчи без стрельбы')
+    parser.add_argument('--profile', action='store_true', help='замерять время обработчиков нашего дрона')
+    parser.add_argument('--slow-tick-ms', type=float, default=None,
+                        help='снимать cProfile после тиков дороже этого порога')
+    parser.add_argument('--background', choices=('thread', 'process'), default=None,
+                        help='фоновое планирование у нашего дрона')
+    parser.add_argument('--params', help='файл JSON с параметрами стратегии нашего дрона')
+    parser.add_argument('--telemetry', help='каталог для телеметрии команд по тикам')
+    parser.add_argument('--telemetry-format', choices=('jsonl', 'csv'), default='jsonl')
+    parser.add_argument('--record', help='каталог для двоичных записей матчей (pazukhin_replay.py)')
+    parser.add_argument('--output', help='файл JSONL для результатов матчей')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for directory in (args.record, args.telemetry):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    results = []
+    output = open(args.output, 'a') if args.output else None
+    try:
+        for result in run_batch(make_matches(args), args.workers):
+            results.append(result)
+            print('seed={seed} engine={engine} won={won} elerium={elerium} steps={game_steps} '
+                  'wall={wall_time}s errors={errors} elerium/tick={elerium_per_tick}'.format(**result))
+            if 'team' in result:
+                print('  assignment {planner_ms_per_tick} ms/tick'.format(**result),
+                      ' '.join('{}={}'.format(name, json.dumps(stat, sort_keys=True))
+                               for name, stat in sorted(result['team'].items())))
+            if 'profile' in result:
+                print_profile(result['profile'])
+            if output:
+                output.write(json.dumps(result, sort_keys=True) + '\n')
+                output.flush()
+    finally:
+        if output:
+            output.close()
+    print(json.dumps(summarize(results), sort_keys=True))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
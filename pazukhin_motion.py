@@ -0,0 +1,84 @@
+from array import array
+
+from robogame_engine.geometry import Point
+
+from pazukhin_vectorized import estimate_velocities, intercept_points
+
+
+class EnemyMotion:
+    """Кольцевые буферы последних положений вражеских дронов и точки упреждения для стрельбы
+
+    Положения хранятся в плоских массивах array: строка на дрона, history записей в строке.
+    Скорости всех противников и точки упреждения для всех пар наш дрон x противник
+    считаются одним проходом раз в тик, при первом запросе, и дальше берутся из кэша.
+    """
+
+    def __init__(self, history=6, lag=3):
+        self.history = history
+        self.lag = lag
+        self.rows = {}
+        self.positions = array('d')
+        self.ticks = array('d')
+        self.cursors = array('q')
+        self.aim_tick = None
+        self.aim = {}
+
+    def row(self, drone_id):
+        """Строка буфера для дрона, для нового дрона буфер расширяется
+
+        :return: row
+        """
+        row = self.rows.get(drone_id)
+        if row is None:
+            row = len(self.rows)
+            self.rows[drone_id] = row
+            self.positions.extend([0.0] * (self.history * 2))
+            self.ticks.extend([-1.0] * self.history)
+            self.cursors.append(0)
+        return row
+
+    def record(self, tick, drones):
+        """Записываем положения дронов на тик, не чаще раза за тик для каждого дрона"""
+        history = self.history
+        for drone in drones:
+            row = self.row(drone.id)
+            count = self.cursors[row]
+            if count and self.ticks[row * history + (count - 1) % history] == tick:
+                continue
+            index = row * history + count % history
+            self.positions[2 * index] = drone.x
+            self.positions[2 * index + 1] = drone.y
+            self.ticks[index] = tick
+            self.cursors[row] = count + 1
+
+    def velocities(self, drones):
+        """Оценки скоростей дронов
+
+        :return: список (vx, vy)
+        """
+        rows = [self.row(drone.id) for drone in drones]
+        return estimate_velocities(self.positions, self.ticks, self.cursors, rows, self.history, self.lag)
+
+    def aim_point(self, tick, shooter, target, shooters, targets, speed, max_time):
+        """Точка, в которую стрелку нужно целиться, чтобы снаряд встретил движущуюся цель.
+        При первом запросе в тике точки считаются сразу для всех shooters x targets
+
+        :return: point
+        """
+        if tick != self.aim_tick:
+            self.aim_tick = tick
+            self.aim = {}
+            points = intercept_points([(drone.x, drone.y) for drone in shooters],
+                                      [(drone.x, drone.y) for drone in targets],
+                                      self.velocities(targets), speed, max_time)
+            for drone, row in zip(shooters, points):
+                for enemy, point in zip(targets, row):
+                    self.aim[(drone.id, enemy.id)] = point
+        key = (shooter.id, target.id)
+        point = self.aim.get(key)
+        if point is None:
+            # Цель или стрелок появились позже расчёта, целимся в текущее положение
+            return target.coord
+        if not isinstance(point, Point):
+            point = self.aim[key] = Point(*point)
+        return point
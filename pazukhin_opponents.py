@@ -0,0 +1,34 @@
+from astrobox.core import Drone
+
+
+class HarvesterDrone(Drone):
+    """Простой соперник для прогонов: возит ресурс с ближайшего непустого астероида на базу"""
+
+    def on_born(self):
+        self.harvest()
+
+    def harvest(self):
+        """Летим к ближайшему непустому астероиду или на базу, если лететь некуда или трюм полон"""
+        stones = [asteroid for asteroid in self.asteroids if asteroid.payload > 0]
+        if not stones or self.is_full:
+            self.move_at(self.my_mothership)
+            return
+        self.move_at(min(stones, key=self.distance_to))
+
+    def on_stop_at_asteroid(self, asteroid):
+        self.load_from(asteroid)
+
+    def on_load_complete(self):
+        self.harvest()
+
+    def on_stop_at_mothership(self, mothership):
+        self.unload_to(mothership)
+
+    def on_unload_complete(self):
+        self.harvest()
+
+    def on_wake_up(self):
+        self.harvest()
+
+
+drone_class = HarvesterDrone
@@ -1,23 +1,33 @@
-import math
-import random
+import heapq
+import os
 
 from astrobox.core import Drone
-from robogame_engine.geometry import Point, Vector
+from robogame_engine.geometry import Point
 from robogame_engine.theme import theme
 
+import pazukhin_geometry as geometry
+from pazukhin_params import ParameterSet
+from pazukhin_planning import plan_route
+from pazukhin_profiling import instrument_from_env
+from pazukhin_vectorized import firing_line_clearance
+from pazukhin_world import DecisionContext, TeamState, per_decision
+
 
 class PazukhinDrone(Drone):
-    steps_full = 0
-    steps_half_full = 0
-    steps_empty = 0
-    stat_printed = False
     space_obj = None
+    decision = None
+    context = None
     enemy = None
+    aim_point = None
     enemies = None
-    defence_positions = []
-    attack_positions = []
+    defence_positions = ()
+    attack_positions = ()
     objects_with_elerium = []
-    shot_distance = 635
+    params = ParameterSet()
+    formation_quantum = 10
+    route = ()
+    route_candidates = 6
+    route_max_stops = 3
     center_scene = None
     my_id = 0
     my_step = 0
@@ -25,17 +35,41 @@ class PazukhinDrone(Drone):
     my_waiting_steps = 0
     my_last_coord = None
     all_elerium = 0
+    team_states = {}
+    background_planning = os.environ.get('PAZUKHIN_BACKGROUND') or None
+    # Файл телеметрии команды (.csv или .jsonl), {team} заменяется именем команды
+    telemetry_path = os.environ.get('PAZUKHIN_TELEMETRY') or None
+
+    @property
+    def shot_distance(self):
+        return self.params.shot_distance
+
+    @property
+    def field(self):
+        return theme.FIELD_WIDTH, theme.FIELD_HEIGHT
 
     def on_heartbeat(self):
+        self.get_team_state().refresh_world(self)
         self.my_step += 1
-        if self.near(self.defense_point()):
+        near_defense = self.is_near_defense_point()
+        if near_defense:
             self.my_steps_in_defense += 1
-        if self.coord == self.my_last_coord and not self.near(self.defense_point()):
+        if self.coord == self.my_last_coord and not near_defense:
             self.my_waiting_steps += 1
+            self.add_telemetry('idle_steps')
         self.my_last_coord = self.coord
+        self.run_pending_replan()
+
+    def on_stop(self):
+        # Поворот к точке упреждения закончился - стреляем, если цель ещё жива и линия огня свободна
+        enemy = self.enemy
+        if enemy is not None and enemy.is_alive and self.aim_point is not None \
+                and self.check_firing_line(enemy, self.coord):
+            self.shoot_if_aimed(enemy)
 
     def on_born(self):
         self.get_all_elerium()
+        self.get_team_state().get_distance_matrix(self)
         self.center_scene = Point(theme.FIELD_WIDTH // 2, theme.FIELD_HEIGHT // 2)
         self.get_defense_positions()
         available, asteroid = self.check_nearest_object_with_etherium()
@@ -49,6 +83,10 @@ class PazukhinDrone(Drone):
             self.turn_to(self.my_mothership)
 
     def on_load_complete(self):
+        self.add_telemetry('loads')
+        self.get_team_state().assignment.release(self)
+        # Назначение освободилось, проверки этого тика нужно считать заново
+        self.context = None
         if self.payload != 100:
             self.choose_the_action()
         else:
@@ -67,6 +105,8 @@ class PazukhinDrone(Drone):
             self.load_from(mothership)
 
     def on_unload_complete(self):
+        self.add_telemetry('unloads')
+        self.clear_route()
         self.choose_the_action()
 
     def on_wake_up(self):
@@ -90,7 +130,7 @@ class PazukhinDrone(Drone):
         :return: boolean
         """
         for tm in self.teammates:
-            if tm.health <= 70 or self.health <= 70:
+            if tm.health <= self.params.health_threshold or self.health <= self.params.health_threshold:
                 return True
         return False
 
@@ -100,62 +140,78 @@ class PazukhinDrone(Drone):
         :param: ememy
         :return: point
         """
-        vec = Vector.from_points(self.coord, enemy.coord, 15)
-        point = Point(x=self.coord.x + vec.x, y=self.coord.y + vec.y)
-        return point
+        vec_x, vec_y = geometry.from_points(self.x, self.y, enemy.x, enemy.y, 15)
+        return Point(x=self.x + vec_x, y=self.y + vec_y)
+
+    def get_context(self):
+        """Возвращаем контекст решения на текущий тик, общий для всех обработчиков событий дрона
+
+        :return: context
+        """
+        tick = self.scene._step
+        if self.context is None or self.context.tick != tick:
+            self.context = DecisionContext(tick, self.get_team_state().decisions)
+        return self.context
+
+    def get_team_state(self):
+        """Возвращаем общее состояние нашей команды, при новой игре создаём его заново
+
+        :return: team_state
+        """
+        team_state = self.team_states.get(self.team)
+        if team_state is None or team_state.scene is not self.scene:
+            if team_state is not None:
+                team_state.close()
+            telemetry_path = self.telemetry_path.format(team=self.team) if self.telemetry_path else None
+            team_state = TeamState(self.scene, self.background_planning, telemetry_path)
+            self.team_states[self.team] = team_state
+        return team_state
+
+    def get_snapshot(self):
+        """Возвращаем общий для команды снимок мира на текущий тик
+
+        :return: snapshot
+        """
+        return self.get_team_state().get_snapshot(self)
 
     def get_enemies(self):
         """Обновляем список вражеских баз и дронов и сохраняем в self.enemies
         """
-        motherships = []
-        for mothership in self.scene.motherships:
-            if mothership.is_alive and mothership != self.my_mothership:
-                motherships.append(mothership)
-        drones = []
-        for drone in self.scene.drones:
-            if drone.is_alive and drone.team != self.team:
-                drones.append(drone)
-        self.enemies = {'motherships': motherships, 'drones': drones}
+        self.enemies = self.get_snapshot().enemies
 
     def get_object_with_etherium(self):
         """Обновляем список объектов с ресурсом и сохраняем в self.objects
         """
-        self.objects_with_elerium = []
-        temp_objects = []
-        for mothership in self.scene.motherships:
-            if not mothership.is_alive and mothership != self.my_mothership and mothership.payload != 0:
-                temp_objects.append({'object': mothership, 'distance': self.my_mothership.distance_to(mothership)})
-        for drone in self.scene.drones:
-            if not drone.is_alive and drone.team != self.team and drone.payload != 0:
-                temp_objects.append({'object': drone, 'distance': self.my_mothership.distance_to(drone)})
-        for asteroid in self.asteroids:
-            if asteroid.payload != 0:
-                temp_objects.append({'object': asteroid, 'distance': self.my_mothership.distance_to(asteroid)})
-        temp_objects = sorted(temp_objects, key=lambda x: x['distance'])
-        objects = []
-        for obj in temp_objects:
-            if not self.check_object_on_fire(obj['object']):
-                objects.append(obj['object'])
-        self.objects_with_elerium = objects
+        self.objects_with_elerium = self.get_snapshot().objects_with_elerium(self.shot_distance)
 
     def get_defense_positions(self):
-        """Получаем координаты для защиты базы"""
-        self.defence_positions.clear()
-        distance = 160
-        angle = 60
+        """Получаем координаты для защиты базы,
+        они зависят только от положения базы и размеров поля и берутся из кэша команды"""
+        base = self.my_mothership
+        params = self.params
+        key = ('defence', base.x, base.y, theme.FIELD_WIDTH, theme.FIELD_HEIGHT,
+               params.defense_distance, params.defense_angle, params.defense_angle_step)
+        self.defence_positions = self.get_team_state().formations.get(key, self.build_defense_positions)
+
+    def build_defense_positions(self):
+        """Строим координаты для защиты базы
+
+        :return: points
+        """
+        distance = self.params.defense_distance
+        angle = self.params.defense_angle
         temp_positions_on_base = []
-        center_scene = Point(theme.FIELD_WIDTH // 2, theme.FIELD_HEIGHT // 2)
+        base_x, base_y = self.my_mothership.x, self.my_mothership.y
+        center_x, center_y = theme.FIELD_WIDTH // 2, theme.FIELD_HEIGHT // 2
         distances = [15, 0, -20, 0, 15]
         for dis in distances:
-            vec = Vector.from_points(self.my_mothership.coord, center_scene, distance + dis)
-            vec.rotate(angle)
-            point = Point(x=self.my_mothership.coord.x + vec.x, y=self.my_mothership.coord.y + vec.y)
-            distance_to = self.center_scene.distance_to(point)
-            temp_positions_on_base.append({'point': point, 'distance': distance_to})
-            angle -= 30
-        temp_positions_on_base = sorted(temp_positions_on_base, key=lambda x: x['distance'])
-        for point in temp_positions_on_base:
-            self.defence_positions.append(point['point'])
+            vec_x, vec_y = geometry.from_points(base_x, base_y, center_x, center_y, distance + dis)
+            vec_x, vec_y = geometry.rotate(vec_x, vec_y, angle)
+            x, y = base_x + vec_x, base_y + vec_y
+            temp_positions_on_base.append((geometry.distance(center_x, center_y, x, y), x, y))
+            angle -= self.params.defense_angle_step
+        temp_positions_on_base.sort()
+        return [Point(x, y) for _, x, y in temp_positions_on_base]
 
     def get_my_id(self):
         """Присваиваем порядковый номер нашим дронам
@@ -188,45 +244,64 @@ class PazukhinDrone(Drone):
         point = self.defence_positions[self.my_id]
         return point
 
+    @per_decision
+    def is_near_defense_point(self):
+        """Находимся ли мы у своей точки обороны
+
+        :return: boolean
+        """
+        return self.near(self.defense_point())
+
+    @per_decision
     def check_enemy_on_protection(self, enemy):
-        """Проверяем находится ли противник под защитой
+        """Проверяем находится ли противник под защитой,
+        защитники берутся из индекса вражеских дронов по базам, а не перебором всех дронов
 
         :return: boolean
         """
-        if enemy in self.enemies['drones']:
-            for mothership in self.enemies['motherships']:
-                if enemy.my_mothership == mothership and 50 < enemy.distance_to(mothership) <= 300:
-                    return True
-            return False
-        count = 0
-        if enemy in self.enemies['motherships']:
-            for drone in self.enemies['drones']:
-                if drone.my_mothership == enemy and 50 < enemy.distance_to(drone) <= 350:
-                    count += 1
-            if count >= 1:
-                return True
-            return False
+        snapshot = self.get_snapshot()
+        if enemy is None:
+            return None
+        if snapshot.plan is not None and enemy.id in snapshot.plan.protected:
+            return snapshot.plan.protected[enemy.id]
+        return snapshot.is_protected(enemy)
 
     def check_object_on_fire(self, obj):
         """Проверяем находится ли объект в зоне досягаемости вражеских орудий
 
         :return: boolean
         """
-        for drone in self.enemies['drones']:
-            if drone.distance_to(obj) <= self.shot_distance:
-                return True
-        return False
+        return self.get_snapshot().is_on_fire(obj, self.shot_distance)
 
-    def get_min_id(self):
-        """Возвращаем миинмальный id среди наших дронов
+    def get_assigned_asteroid(self):
+        """Возвращаем астероид, назначенный дрону общим распределением команды
+        Кандидаты - астероиды не меньше чем с asteroid_min_payload ресурса дальше asteroid_min_base_distance от базы
+        (расстояния до базы берутся из матрицы расстояний команды), стоимость - расстояние от дрона до астероида
 
-        :return: min_id
+        :return: asteroid или None
         """
-        min_id = self.id
-        for tm in self.teammates:
-            if tm.id < min_id:
-                min_id = tm.id
-        return min_id
+        snapshot = self.get_snapshot()
+        team_state = self.get_team_state()
+        assignment = team_state.assignment
+        stone = assignment.get(self)
+        if stone is None:
+            center_scene = Point(theme.FIELD_WIDTH // 2, theme.FIELD_HEIGHT // 2)
+            params = self.params
+            max_distance = self.my_mothership.distance_to(center_scene) * params.asteroid_radius_ratio
+            matrix = team_state.get_distance_matrix(self)
+            stones = [stone for stone in snapshot.asteroids
+                      if stone.payload >= params.asteroid_min_payload
+                      and matrix.base_distance(stone) > params.asteroid_min_base_distance]
+
+            def cost(drone, stone):
+                distance = snapshot.distance(drone, stone)
+                if distance > max_distance:
+                    return None
+                return distance
+
+            assignment.update(snapshot.tick, [self] + self.teammates, stones, cost)
+            stone = assignment.get(self)
+        return stone
 
     def check_nearest_object_with_etherium(self):
         """Возвращает ближайший непустой астероид
@@ -234,51 +309,70 @@ class PazukhinDrone(Drone):
 
         :return: available, asteroid
         """
+        snapshot = self.get_snapshot()
         asteroid = None
         available = False
-        asts = []
-        distance = 0
-        center_scene = Point(theme.FIELD_WIDTH // 2, theme.FIELD_HEIGHT // 2)
-        for stone in self.asteroids:
-            if stone.payload >= 90 and self.distance_to(stone) > distance \
-                    and self.my_mothership.distance_to(stone) > 250:
-                max_distance = self.my_mothership.distance_to(center_scene) * 0.75
-        for stone in self.asteroids:
-            if stone.payload >= 90 and self.my_mothership.distance_to(stone) > 250 and (
-                    self.distance_to(stone) <= max_distance):
-                asts.append({'stone': stone, 'payload': self.distance_to(stone)})
-        asts = sorted(asts, key=lambda x: x['payload'])
-        min_id = self.get_min_id()
-        if len(asts) != 0:
-            if len(asts) >= self.id - min_id:
+        stone = self.get_assigned_asteroid()
+        if stone is not None:
+            available = True
+            asteroid = stone
+        if self.payload < 100 and (stone is None or stone.payload < self.free_space):
+            # Назначенного астероида не хватит до полного трюма - собираем по маршруту из нескольких астероидов
+            stone = self.next_route_stop(stone)
+            if stone is not None:
                 available = True
-                asteroid = asts[self.id - min_id - 1]['stone']
-            else:
+                asteroid = stone
+        else:
+            self.clear_route()
+        if asteroid is None and available is False:
+            stone, _ = snapshot.asteroid_index.nearest(self, lambda x: x.payload != 0)
+            if stone is not None:
                 available = True
-                asteroid = random.choice(asts)['stone']
-        if (75 < self.payload < 100) or (asteroid is None and available is False):
-            distance = 9999999.99999
-            for stone in self.asteroids:
-                if stone.payload != 0 and self.distance_to(stone) < distance:
-                    distance = self.distance_to(stone)
-                    available = True
-                    asteroid = stone
-        if (75 < self.payload < 100) or (asteroid is None and available is False):
-            distance = 9999999.99999
-            for drone in self.scene.drones:
-                if drone.payload != 0 and self.distance_to(drone) < distance and not drone.is_alive:
-                    distance = self.distance_to(drone)
-                    available = True
-                    asteroid = drone
-        if (75 < self.payload < 100) or (asteroid is None and available is False):
-            distance = 9999999.99999
-            for mothership in self.scene.motherships:
-                if mothership.payload != 0 and self.distance_to(mothership) < distance and not mothership.is_alive:
-                    distance = self.distance_to(mothership)
+                asteroid = stone
+        # Затем ближайшие обломки дронов и баз
+        for index in [snapshot.drone_index, snapshot.mothership_index]:
+            if (75 < self.payload < 100) or (asteroid is None and available is False):
+                obj, _ = index.nearest(self, lambda x: not x.is_alive and x.payload != 0)
+                if obj is not None:
                     available = True
-                    asteroid = mothership
+                    asteroid = obj
         return available, asteroid
 
+    def next_route_stop(self, assigned=None):
+        """Возвращаем следующий астероид маршрута сбора,
+        маршрут перестраивается, если на оставшихся астероидах не хватит ресурса до полного трюма.
+        Кандидаты - назначенный дрону астероид и ближайшие астероиды, не занятые другими дронами команды,
+        астероиды маршрута занимаются в общем распределении
+
+        :return: asteroid или None
+        """
+        snapshot = self.get_snapshot()
+        team_state = self.get_team_state()
+        route = [stone for stone in self.route if stone.payload != 0]
+        if not route or sum(stone.payload for stone in route) < self.free_space:
+            taken = team_state.assignment.taken_by_others(self)
+            matrix = team_state.get_distance_matrix(self)
+            candidates = heapq.nsmallest(self.route_candidates,
+                                         [stone for stone in snapshot.asteroids
+                                          if stone.payload != 0 and stone.id not in taken and stone is not assigned],
+                                         key=lambda stone: snapshot.distance(self, stone))
+            if assigned is not None:
+                candidates.append(assigned)
+            route = plan_route(matrix, candidates,
+                               [snapshot.distance(self, stone) for stone in candidates],
+                               self.free_space, self.route_max_stops)
+        self.route = route
+        team_state.assignment.reserve(self, route)
+        if len(route) == 0:
+            return None
+        return route[0]
+
+    def clear_route(self):
+        """Забываем маршрут сбора и освобождаем его астероиды"""
+        if self.route:
+            self.route = ()
+            self.get_team_state().assignment.reserve(self, [])
+
     def search_nearest_enemy(self):
         """Возвращает ближайшего противника
         доступени или нет(boolean), ближайший противник или None, если такового нет
@@ -286,63 +380,52 @@ class PazukhinDrone(Drone):
         :return: available, enemy
         """
         self.get_enemies()
-        available = False
-        enemy = None
-        distance = 99999999.99999
-        for drone in self.enemies['drones']:
-            if self.my_mothership.distance_to(drone) < distance and not self.check_enemy_on_protection(drone):
-                distance = self.my_mothership.distance_to(drone)
-                available = True
-                enemy = drone
+        snapshot = self.get_snapshot()
+        enemy, _ = snapshot.drone_index.nearest(
+            self.my_mothership,
+            lambda drone: snapshot.is_enemy_drone(drone) and not self.check_enemy_on_protection(drone))
+        available = enemy is not None
         if not available:
-            for mothership in self.enemies['motherships']:
-                if not self.check_enemy_on_protection(mothership):
-                    enemy = mothership
-                    available = True
+            unprotected = snapshot.unprotected_motherships()
+            if unprotected:
+                enemy = unprotected[-1]
+                available = True
         return available, enemy
 
+    def add_telemetry(self, counter, value=1):
+        """Прибавляем value к счётчику телеметрии команды для этого дрона в текущем тике"""
+        self.get_team_state().telemetry.add(self.scene._step, self.id, counter, value)
+
     def add_stat(self, obj):
-        """Сохраняем дистанцию перемещения в статистику
+        """Сохраняем дистанцию перемещения в телеметрию
         в зависимости от загруженности дрона
         """
-        distance = self.distance_to(obj)
-        if self.payload == 0:
-            self.steps_empty += distance
-        elif self.payload == 100:
-            self.steps_full += distance
-        elif 1 <= self.payload <= 99:
-            self.steps_half_full += distance
+        self.get_team_state().telemetry.add_distance(self.scene._step, self.id, self.payload, self.distance_to(obj))
 
     def add_stat_and_move_to_obj(self, space_object):
         """Сохраняем перемещение в статистику и перемещаемся"""
+        self.decision = space_object
+        self.aim_point = None
         self.stop()
         self.add_stat(space_object)
         self.move_at(space_object)
 
     def print_statistic(self, all_on_mothership):
         """Если все дроны на базе и нет непустых астероидов
-        выводится статистика"""
-        available = False
-        for asteroid in self.asteroids:
-            if asteroid.payload != 0:
-                available = True
-        stat_printed = False
-        for drone in self.teammates:
-            if drone.stat_printed:
-                stat_printed = True
-        if all_on_mothership and not stat_printed and not available:
-            steps_full = 0
-            steps_half_full = 0
-            steps_empty = 0
-            for drone in self.teammates:
-                steps_full = drone.steps_full
-                steps_half_full = drone.steps_half_full
-                steps_empty = drone.steps_empty
-                all_steps = steps_full + steps_half_full + steps_empty
-            print(f'Пройдено полным {round((steps_full * 100) / all_steps)} процентов от пройденного пути')
-            print(f'Пройдено полупустым {round((steps_half_full * 100) / all_steps)} процентов от пройденного пути')
-            print(f'Пройдено пустым {round((steps_empty * 100) / all_steps)} процентов от пройденного пути')
-            self.stat_printed = True
+        один раз за игру выводится статистика пути всей команды"""
+        available = len(self.get_snapshot().asteroids) != 0
+        telemetry = self.get_team_state().telemetry
+        if all_on_mothership and not telemetry.summary_printed and not available:
+            totals = telemetry.team_totals()
+            all_steps = totals['distance_full'] + totals['distance_half_full'] + totals['distance_empty']
+            if all_steps:
+                print(f'Пройдено полным {round((totals["distance_full"] * 100) / all_steps)} '
+                      f'процентов от пройденного пути')
+                print(f'Пройдено полупустым {round((totals["distance_half_full"] * 100) / all_steps)} '
+                      f'процентов от пройденного пути')
+                print(f'Пройдено пустым {round((totals["distance_empty"] * 100) / all_steps)} '
+                      f'процентов от пройденного пути')
+            telemetry.summary_printed = True
 
     def check_all_drones_on_mothership(self):
         """Проверяем все ли дроны на базе
@@ -359,38 +442,60 @@ class PazukhinDrone(Drone):
             all_on_mothership = False
         return all_on_mothership
 
-    def get_angle(self, position, teammate, enemy):
-        """Получает угол между векторами position-enemy и teammate-enemy
-        """
-
-        def scalar(vec1, vec2):
-            return vec1.x * vec2.x + vec1.y * vec2.y
+    def get_aim_point(self, enemy):
+        """Точка упреждения для стрельбы по противнику с учётом его скорости,
+        общая для команды в пределах тика
 
-        v12 = Vector(position.x - enemy.x, position.y - enemy.y)
-        v32 = Vector(teammate.x - enemy.x, teammate.y - enemy.y)
-        _cos = scalar(v12, v32) / (v12.module * v32.module + 1.e-8)
-        return math.degrees(math.acos(_cos))
+        :return: point
+        """
+        snapshot = self.get_snapshot()
+        if not snapshot.is_enemy_drone(enemy):
+            return enemy.coord
+        return self.get_team_state().motion.aim_point(
+            snapshot.tick, self, enemy, [self] + self.teammates, snapshot.enemies['drones'],
+            theme.PROJECTILE_SPEED, theme.PROJECTILE_TTL)
+
+    def shoot_if_aimed(self, enemy):
+        """Стреляем по противнику, если он в досягаемости, а курс уже смотрит на точку упреждения.
+        Снаряд летит по текущему курсу, поэтому во время поворота не стреляем - выстрел сделает on_stop"""
+        aim_point = self.aim_point
+        if aim_point is None:
+            return False
+        if geometry.heading_miss(self.x, self.y, self.direction, aim_point.x, aim_point.y) > enemy.radius:
+            return False
+        if self.distance_to(enemy) <= self.shot_distance + 50:
+            if self.gun.can_shot:
+                self.add_telemetry('shots')
+            self.gun.shot(enemy)
+        return True
 
     def check_firing_line(self, enemy, position):
         """Проверяем нет ли рядом или на линии огня наших teammates, чтобы их не подстрелить
 
         :return: boolean
         """
-        flag = True
-        for teammate in self.teammates:
-            xy0 = teammate.coord
-            xy1 = position
-            xy2 = enemy.coord
-            chisl = abs((xy2.y - xy1.y) * xy0.x - (xy2.x - xy1.x) * xy0.y + xy2.x * xy1.y - xy2.y * xy1.x)
-            znam = math.sqrt((xy2.y - xy1.y) ** 2 + (xy2.x - xy1.x) ** 2)
-            dist = chisl / znam
-            if dist < 20 or (self.get_angle(position, teammate.coord, enemy.coord) < 30
-                             and teammate.distance_to(position) < 45) \
-                    or teammate.distance_to(position) < 25 or teammate.distance_to(enemy) < 20:
-                flag = False
-                break
-        return flag
+        safe, _ = firing_line_clearance([position], self.teammates, enemy.coord)
+        return safe[0]
+
+    def get_firing_position(self, enemy):
+        """Выбираем позицию для стрельбы: шаг к противнику, если с него линия огня безопасна,
+        иначе безопасную точку нападения с наибольшим запасом, если таких нет - всё равно шаг к противнику
 
+        :return: point
+        """
+        positions = [self.shift_point(enemy), *self.attack_positions]
+        safe, margins = firing_line_clearance(positions, self.teammates, enemy.coord)
+        if safe[0]:
+            return positions[0]
+        best = positions[0]
+        best_margin = None
+        for position, is_safe, margin in zip(positions[1:], safe[1:], margins[1:]):
+            if is_safe and (best_margin is None or margin > best_margin):
+                best = position
+                best_margin = margin
+        return best
+
+    @per_decision
     def check_win(self):
         """Проверяем, что у нас больше всех ресурсов
 
@@ -421,28 +526,69 @@ class PazukhinDrone(Drone):
         return point
 
     def get_attack_positions(self, enemy):
-        """Формируем список координат точек нападения"""
-        temp_attack_positions = []
-        distance = self.shot_distance + 20
-        angle = 24
-        distances = [20, 15, 10, 5, 0, 5, 10, 15, 20]
-        test_points = []
-        for dis in distances:
-            vec = Vector.from_points(enemy.coord, self.my_mothership.coord, distance + dis)
-            vec.rotate(angle)
-            point = Point(x=enemy.coord.x + vec.x, y=enemy.coord.y + vec.y)
-            test_points.append(point)
-            if int(point.x) in range(50, 1150) and int(point.y) in range(50, 1150) \
-                    and not self.my_mothership.distance_to(point) < 100:
-                temp_attack_positions.append({'point': point,
-                                              'distance': self.my_mothership.distance_to(point)})
-            angle -= 6
-        temp_attack_positions = sorted(temp_attack_positions, key=lambda x: x['distance'])
-        self.attack_positions.clear()
-        for a_p in temp_attack_positions:
-            self.attack_positions.append(a_p['point'])
+        """Формируем список координат точек нападения,
+        положение противника округляется до formation_quantum, построения берутся из кэша команды,
+        а при промахе - из готового фонового плана, если он есть"""
+        base = self.my_mothership
+        quantum = self.formation_quantum
+        enemy_x = round(enemy.x / quantum) * quantum
+        enemy_y = round(enemy.y / quantum) * quantum
+        params = self.params
+        key = ('attack', enemy_x, enemy_y, base.x, base.y, self.field, params.shot_distance,
+               params.attack_distance_offset, params.attack_angle, params.attack_angle_step)
+        plan = self.get_snapshot().plan
+        if plan is not None and (enemy_x, enemy_y) in plan.attack_positions:
+            positions = plan.attack_positions[(enemy_x, enemy_y)]
+            build = lambda: [Point(x, y) for x, y in positions]
+        else:
+            build = lambda: self.build_attack_positions(enemy_x, enemy_y)
+        self.attack_positions = self.get_team_state().formations.get(key, build)
+
+    def build_attack_positions(self, enemy_x, enemy_y):
+        """Строим координаты точек нападения на противника в точке (enemy_x, enemy_y)
+
+        :return: points
+        """
+        base = self.my_mothership
+        params = self.params
+        return [Point(x, y) for x, y in geometry.attack_formation(
+            enemy_x, enemy_y, base.x, base.y, params.shot_distance + params.attack_distance_offset,
+            params.attack_angle, params.attack_angle_step, *self.field)]
+
+    def check_urgent(self):
+        """Нужно ли пересчитать решение немедленно: кому-то из нас грозит гибель
+        или противник на расстоянии выстрела
+
+        :return: boolean
+        """
+        if self.check_health():
+            return True
+        distance = self.get_snapshot().threat_distance(self, self.shot_distance)
+        return distance is not None and distance <= self.shot_distance + 100
 
     def choose_the_action(self):
+        """Выбираем действие, если планировщик команды разрешает пересчёт в этом тике,
+        иначе продолжаем выполнять прошлое решение"""
+        tick = self.scene._step
+        scheduler = self.get_team_state().scheduler
+        if scheduler.should_replan(self, tick, self.check_urgent()):
+            self.decision = None
+            self.plan_the_action()
+            scheduler.planned(self, tick, self.decision)
+
+    def run_pending_replan(self):
+        """Выполняем пересчёт решения, отложенный планировщиком, по сердцебиению дрона.
+        Дрон в обороне ждёт события пробуждения: счётчик обороны рассчитан на такой темп пересчётов"""
+        if not self.is_alive or self.is_near_defense_point():
+            return
+        tick = self.scene._step
+        scheduler = self.get_team_state().scheduler
+        if scheduler.should_replan_pending(self, tick):
+            self.decision = None
+            self.plan_the_action()
+            scheduler.planned(self, tick, self.decision)
+
+    def plan_the_action(self):
         """Выбираем действие,
         зависит от того есть ли непустые астероиды
         после того как закончились астероиды вступаем в бой с противником
@@ -476,7 +622,7 @@ class PazukhinDrone(Drone):
             self.get_attack_positions(enemy)
             self.enemy = enemy
         # Если завис надолго отправляем на бвзу (не помогает)
-        if self.my_waiting_steps > 500 and not self.check_win():
+        if self.my_waiting_steps > self.params.stuck_limit and not self.check_win():
             self.add_stat_and_move_to_obj(self.defense_point())
 
         # Выбор дейстия
@@ -484,39 +630,42 @@ class PazukhinDrone(Drone):
         if available and self.my_mothership.payload < self.all_elerium // 4:
             self.add_stat_and_move_to_obj(asteroid)
         # Условия, при которых переходим в оборону
-        elif not self.near(self.defense_point()) \
+        elif not self.is_near_defense_point() \
                 and ((self.check_win() and not available)
                      or (enemy_av and self.my_mothership.distance_to(enemy) <= self.shot_distance + 20)
-                     or (len(self.enemies['drones']) > 5 and len(self.teammates) < 3)):
+                     or (len(self.enemies['drones']) > self.params.enemy_count_threshold and len(self.teammates) < 3)):
             self.clear_my_steps_in_defense()
             self.add_stat_and_move_to_obj(self.defense_point())
         # Враг в зоне досягаемости -> поворачиваемся и стреляем
         elif enemy_av and self.distance_to(enemy) <= self.shot_distance + 100 \
-                and (self.check_firing_line(enemy, self.coord) or self.near(self.defense_point())):
-            self.turn_to(enemy)
-            if self.distance_to(enemy) <= self.shot_distance + 50:
-                self.gun.shot(enemy)
+                and (self.check_firing_line(enemy, self.coord) or self.is_near_defense_point()):
+            self.aim_point = self.get_aim_point(enemy)
+            if not self.shoot_if_aimed(enemy):
+                self.turn_to(self.aim_point)
             if self.my_waiting_steps > 25:
                 self.my_waiting_steps = 0
-                self.add_stat_and_move_to_obj(self.shift_point(enemy))
+                self.add_stat_and_move_to_obj(self.get_firing_position(enemy))
         # Условия для перехода в наступление
-        elif enemy_av and (self.my_steps_in_defense > 200 or len(self.enemies['drones']) < 5) \
+        elif enemy_av and (self.my_steps_in_defense > self.params.defense_timeout
+                           or len(self.enemies['drones']) < self.params.enemy_count_threshold) \
                 and not self.check_enemy_on_protection(enemy) \
                 and (self.my_mothership.distance_to(enemy) >= self.shot_distance + 20 or not self.check_win()):
             self.my_steps_in_defense = 0
             self.add_stat_and_move_to_obj(self.attack_point())
         # Условия, при которых подбираем ресурс с объектов
-        elif len(self.objects_with_elerium) != 0 and (self.my_id == 0 or len(self.enemies['drones']) < 5):
+        elif len(self.objects_with_elerium) != 0 \
+                and (self.my_id == 0 or len(self.enemies['drones']) < self.params.enemy_count_threshold):
             for obj in self.objects_with_elerium:
                 if (self.check_enemy_on_protection(enemy)
-                    or self.my_mothership.distance_to(obj) <= 450) \
+                    or self.my_mothership.distance_to(obj) <= self.params.loot_radius) \
                         and not self.check_object_on_fire(obj):
                     self.space_obj = obj
                     self.add_stat_and_move_to_obj(self.space_obj)
                     break
         # В остальных случаях сидим в обороне
-        elif not self.near(self.defense_point()):
+        elif not self.is_near_defense_point():
             self.add_stat_and_move_to_obj(self.defense_point())
 
 
+instrument_from_env(PazukhinDrone)
 drone_class = PazukhinDrone
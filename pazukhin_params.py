@@ -0,0 +1,110 @@
+import json
+
+# Значения по умолчанию - те, с которыми бот играл до появления набора параметров
+DEFAULTS = {
+    # Дальность, на которой считаем противника опасным и начинаем стрелять
+    'shot_distance': 635,
+    # Какие астероиды распределяются между дронами: не меньше ресурса, не ближе к базе,
+    # не дальше доли расстояния от базы до центра поля
+    'asteroid_min_payload': 90,
+    'asteroid_min_base_distance': 250,
+    'asteroid_radius_ratio': 0.75,
+    # Через сколько сердцебиений в обороне разрешено наступление
+    'defense_timeout': 200,
+    # Через сколько сердцебиений без движения дрон возвращается в оборону
+    'stuck_limit': 500,
+    # Сколько вражеских дронов считается большой армией
+    'enemy_count_threshold': 5,
+    # Здоровье, при котором дрон летит лечиться
+    'health_threshold': 70,
+    # Радиус вокруг базы, в котором подбираем обломки без защиты
+    'loot_radius': 450,
+    # Построение обороны: расстояние от базы, начальный угол и шаг веера
+    'defense_distance': 160,
+    'defense_angle': 60,
+    'defense_angle_step': 30,
+    # Построение нападения: запас к дальности выстрела, начальный угол и шаг веера
+    'attack_distance_offset': 20,
+    'attack_angle': 24,
+    'attack_angle_step': 6,
+}
+
+# Границы поиска для подбора: (нижняя, верхняя, тип)
+SEARCH_SPACE = {
+    'shot_distance': (560, 700, int),
+    'asteroid_min_payload': (50, 150, int),
+    'asteroid_min_base_distance': (100, 400, int),
+    'asteroid_radius_ratio': (0.5, 1.2, float),
+    'defense_timeout': (50, 400, int),
+    'stuck_limit': (100, 800, int),
+    'enemy_count_threshold': (3, 7, int),
+    'health_threshold': (40, 90, int),
+    'loot_radius': (300, 700, int),
+    'defense_distance': (120, 220, int),
+    'defense_angle': (40, 80, int),
+    'defense_angle_step': (20, 40, int),
+    'attack_distance_offset': (0, 60, int),
+    'attack_angle': (12, 36, int),
+    'attack_angle_step': (3, 9, int),
+}
+
+
+class ParameterSet:
+    """Набор настраиваемых параметров стратегии
+
+    Параметры читаются как атрибуты, неизвестные имена - ошибка, чтобы опечатка
+    в конфигурации подбора не проходила молча.
+    """
+
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(DEFAULTS)
+        if unknown:
+            raise ValueError('Неизвестные параметры: {}'.format(', '.join(sorted(unknown))))
+        self.__dict__.update(DEFAULTS)
+        self.__dict__.update(overrides)
+
+    def __repr__(self):
+        return 'ParameterSet({})'.format(self.key())
+
+    def __eq__(self, other):
+        return isinstance(other, ParameterSet) and self.as_dict() == other.as_dict()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in DEFAULTS}
+
+    def overrides(self):
+        """Параметры, отличающиеся от значений по умолчанию
+
+        :return: dict
+        """
+        return {name: value for name, value in self.as_dict().items() if value != DEFAULTS[name]}
+
+    def replace(self, **overrides):
+        """Копия набора с заменёнными параметрами
+
+        :return: ParameterSet
+        """
+        return ParameterSet(**dict(self.as_dict(), **overrides))
+
+    def key(self):
+        """Устойчивая строка для ключей кэша
+
+        :return: str
+        """
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """Читаем набор из файла JSON, в файле может быть лишь часть параметров
+
+        :return: ParameterSet
+        """
+        with open(path) as source:
+            return cls(**json.load(source))
+
+    def save(self, path):
+        with open(path, 'w') as output:
+            json.dump(self.as_dict(), output, indent=2, sort_keys=True)
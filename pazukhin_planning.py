@@ -0,0 +1,237 @@
+import math
+import time
+
+
+class DistanceMatrix:
+    """Расстояния между астероидами и от астероидов до базы
+
+    Астероиды неподвижны, поэтому матрица считается один раз за игру.
+    Для очень больших полей строки считаются по требованию и запоминаются.
+    """
+
+    def __init__(self, asteroids, mothership, eager_limit=500):
+        self.asteroids = list(asteroids)
+        self.index = {asteroid.id: i for i, asteroid in enumerate(self.asteroids)}
+        self.coords = [(asteroid.x, asteroid.y) for asteroid in self.asteroids]
+        base_x, base_y = mothership.x, mothership.y
+        self.to_base = [math.hypot(x - base_x, y - base_y) for x, y in self.coords]
+        self._rows = {}
+        if len(self.asteroids) <= eager_limit:
+            for i in range(len(self.asteroids)):
+                self._row(i)
+
+    def __len__(self):
+        return len(self.asteroids)
+
+    def _row(self, i):
+        row = self._rows.get(i)
+        if row is None:
+            x0, y0 = self.coords[i]
+            row = [math.hypot(x - x0, y - y0) for x, y in self.coords]
+            self._rows[i] = row
+        return row
+
+    def between(self, left, right):
+        """Расстояние между двумя астероидами
+
+        :return: distance
+        """
+        return self._row(self.index[left.id])[self.index[right.id]]
+
+    def base_distance(self, asteroid):
+        """Расстояние от астероида до базы
+
+        :return: distance
+        """
+        return self.to_base[self.index[asteroid.id]]
+
+
+def plan_route(matrix, stones, start_distances, free_space, max_stops=3):
+    """Подбираем цепочку астероидов для одного рейса
+
+    Предпочитаем маршруты, которые заполняют дрона до конца, среди них - с наименьшим
+    путём от дрона через все астероиды до базы. Если заполниться нельзя,
+    выбираем маршрут с наименьшим путём на единицу собранного ресурса.
+
+    :param matrix: DistanceMatrix
+    :param stones: непустые астероиды-кандидаты
+    :param start_distances: расстояния от дрона до каждого из stones
+    :param free_space: свободное место в трюме
+    :param max_stops: наибольшее число астероидов в маршруте
+    :return: список астероидов
+    """
+    best_key = None
+    best_route = []
+    stack = [((stone,), distance, stone.payload) for stone, distance in zip(stones, start_distances)]
+    while stack:
+        route, travelled, collected = stack.pop()
+        last = route[-1]
+        total = travelled + matrix.base_distance(last)
+        filled = collected >= free_space
+        key = (0, total) if filled else (1, total / collected)
+        if best_key is None or key < best_key:
+            best_key = key
+            best_route = list(route)
+        if filled or len(route) == max_stops:
+            continue
+        for stone in stones:
+            if stone not in route:
+                stack.append((route + (stone,), travelled + matrix.between(last, stone), collected + stone.payload))
+    return best_route
+
+
+def min_cost_assignment(cost):
+    """Венгерский алгоритм для прямоугольной матрицы стоимостей
+
+    :param cost: список строк одинаковой длины
+    :return: список пар (строка, столбец) с наименьшей суммарной стоимостью
+    """
+    n = len(cost)
+    if n == 0 or len(cost[0]) == 0:
+        return []
+    m = len(cost[0])
+    if n > m:
+        transposed = [[cost[i][j] for i in range(n)] for j in range(m)]
+        return [(row, col) for col, row in min_cost_assignment(transposed)]
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = math.inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j] != 0]
+
+
+class TeamAssignment:
+    """Распределение дронов команды по астероидам с наименьшей суммарной стоимостью
+
+    Назначения живут между тиками. Пересчёт нужен, когда астероид опустел
+    или дрон освободился, а для дронов без назначения - не чаще раза за тик.
+    Заново распределяются лишь свободные дроны по незанятым астероидам.
+    Астероиды маршрутов сбора тоже заняты, пока дрон не сменит маршрут.
+    Чтение назначения дрона - O(1).
+    """
+    unreachable = 1.e9
+
+    def __init__(self):
+        self.assignments = {}
+        self.routes = {}
+        self.dirty = True
+        self.tick = None
+        self.solves = 0
+        self.solve_seconds = 0.0
+
+    def get(self, drone):
+        """Возвращаем астероид, назначенный дрону, опустевший астероид освобождаем
+
+        :return: asteroid или None
+        """
+        stone = self.assignments.get(drone.id)
+        if stone is not None and stone.payload == 0:
+            del self.assignments[drone.id]
+            self.dirty = True
+            return None
+        return stone
+
+    def release(self, drone):
+        """Дрон закончил работу с астероидом, его назначение освобождается"""
+        if self.assignments.pop(drone.id, None) is not None:
+            self.dirty = True
+
+    def reserve(self, drone, stones):
+        """Занимаем за дроном астероиды его маршрута сбора, пустой список освобождает маршрут"""
+        stones = [stone for stone in stones if stone.payload != 0]
+        previous = self.routes.pop(drone.id, [])
+        if stones:
+            self.routes[drone.id] = stones
+        if {stone.id for stone in previous} != {stone.id for stone in stones}:
+            self.dirty = True
+
+    def taken_by_others(self, drone):
+        """Астероиды, назначенные другим дронам или занятые их маршрутами
+
+        :return: set id астероидов
+        """
+        taken = {stone.id for drone_id, stone in self.assignments.items() if drone_id != drone.id}
+        for drone_id, route in self.routes.items():
+            if drone_id != drone.id:
+                taken.update(stone.id for stone in route if stone.payload != 0)
+        return taken
+
+    def update(self, tick, drones, stones, cost):
+        """Распределяем свободных дронов по незанятым астероидам,
+        если что-то изменилось или в этом тике распределения ещё не было
+
+        :param tick: текущий тик игры
+        :param drones: дроны команды, которые могут получить назначение
+        :param stones: астероиды-кандидаты
+        :param cost: функция (drone, stone) -> стоимость или None, если астероид дрону не подходит
+        """
+        if not self.dirty and tick == self.tick:
+            return
+        started = time.perf_counter()
+        drone_ids = {drone.id for drone in drones}
+        for drone_id, stone in list(self.assignments.items()):
+            if drone_id not in drone_ids or stone.payload == 0:
+                del self.assignments[drone_id]
+        for drone_id in list(self.routes):
+            if drone_id not in drone_ids:
+                del self.routes[drone_id]
+        taken = {stone.id for stone in self.assignments.values()}
+        for route in self.routes.values():
+            taken.update(stone.id for stone in route if stone.payload != 0)
+        free_drones = [drone for drone in drones if drone.id not in self.assignments]
+        free_stones = [stone for stone in stones if stone.id not in taken]
+        if free_drones and free_stones:
+            matrix = []
+            for drone in free_drones:
+                row = []
+                for stone in free_stones:
+                    value = cost(drone, stone)
+                    row.append(self.unreachable if value is None else value)
+                matrix.append(row)
+            for row, col in min_cost_assignment(matrix):
+                if matrix[row][col] < self.unreachable:
+                    self.assignments[free_drones[row].id] = free_stones[col]
+        self.dirty = False
+        self.tick = tick
+        self.solves += 1
+        self.solve_seconds += time.perf_counter() - started
+
+    def stats(self):
+        """Статистика распределения: число решений и затраченное на них время
+
+        :return: dict
+        """
+        return {'solves': self.solves, 'solve_ms': round(self.solve_seconds * 1.e3, 3)}
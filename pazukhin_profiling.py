@@ -0,0 +1,232 @@
+import atexit
+import cProfile
+import functools
+import json
+import math
+import os
+import pstats
+import sys
+import time
+
+CALLBACKS = (
+    'on_born', 'on_heartbeat', 'on_wake_up', 'on_stop_at_asteroid', 'on_load_complete',
+    'on_stop_at_mothership', 'on_unload_complete',
+)
+HELPERS = (
+    'choose_the_action', 'plan_the_action', 'check_nearest_object_with_etherium', 'get_object_with_etherium',
+    'search_nearest_enemy', 'check_enemy_on_protection', 'check_firing_line', 'get_attack_positions',
+    'get_assigned_asteroid', 'next_route_stop', 'check_all_drones_on_mothership',
+)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами
+
+    Память не зависит от числа вызовов, перцентили считаются с точностью до ширины корзины (~9%),
+    максимум и сумма - точно.
+    """
+    min_seconds = 1.e-7
+    buckets_per_octave = 8
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds <= self.min_seconds:
+            bucket = 0
+        else:
+            bucket = int(math.log2(seconds / self.min_seconds) * self.buckets_per_octave) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-я доля вызовов
+
+        :return: seconds
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = self.min_seconds * 2 ** (bucket / self.buckets_per_octave)
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self):
+        """Сводка в миллисекундах
+
+        :return: dict
+        """
+        return {
+            'calls': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'p50_ms': round(self.percentile(0.5) * 1000, 4),
+            'p99_ms': round(self.percentile(0.99) * 1000, 4),
+            'max_ms': round(self.max * 1000, 4),
+        }
+
+
+class Profiler:
+    """Замеры времени обработчиков событий и помощников дрона
+
+    Время считается включительно: вложенный помощник учитывается и в своём счётчике,
+    и в счётчике вызвавшего его обработчика. Стоимость тика - сумма вызовов верхнего уровня.
+    Если тик дороже slow_tick_ms, следующие capture_ticks тиков снимаются cProfile.
+    """
+
+    def __init__(self, slow_tick_ms=None, capture_ticks=5, max_captures=10, capture_dir=None):
+        self.slow_tick = slow_tick_ms / 1000 if slow_tick_ms else None
+        self.capture_ticks = capture_ticks
+        self.max_captures = max_captures
+        self.capture_dir = capture_dir
+        self.methods = {}
+        self.drones = {}
+        self.ticks = LatencyHistogram()
+        self.slow_ticks = 0
+        self.captures = []
+        self._depth = 0
+        self._tick = None
+        self._tick_cost = 0.0
+        self._capture = None
+        self._capture_until = None
+
+    def histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = LatencyHistogram()
+        return histogram
+
+    def wrap(self, name, method):
+        """Оборачиваем метод дрона замером времени
+
+        :return: function
+        """
+        profiler = self
+
+        @functools.wraps(method)
+        def wrapper(drone, *args, **kwargs):
+            if profiler._depth == 0:
+                profiler.start_call(drone.scene._step)
+            profiler._depth += 1
+            started = time.perf_counter()
+            try:
+                return method(drone, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                profiler._depth -= 1
+                profiler.histogram(profiler.methods, name).add(elapsed)
+                profiler.histogram(profiler.drones, (name, drone.id)).add(elapsed)
+                if profiler._depth == 0:
+                    profiler._tick_cost += elapsed
+
+        wrapper.profiled = method
+        return wrapper
+
+    def start_call(self, tick):
+        """Перед вызовом верхнего уровня закрываем предыдущий тик, если он сменился"""
+        if tick != self._tick:
+            self.finish_tick()
+            self._tick = tick
+            if self._capture is None and self._capture_until is not None:
+                self._capture = cProfile.Profile()
+                self._capture.enable()
+        if self._capture is not None and tick > self._capture_until:
+            self.stop_capture()
+
+    def finish_tick(self):
+        if self._tick is None:
+            return
+        self.ticks.add(self._tick_cost)
+        if self.slow_tick is not None and self._tick_cost > self.slow_tick:
+            self.slow_ticks += 1
+            if self._capture_until is None and len(self.captures) < self.max_captures:
+                self._capture_until = self._tick + self.capture_ticks
+                self.captures.append({'slow_tick': self._tick, 'cost_ms': round(self._tick_cost * 1000, 3)})
+        self._tick_cost = 0.0
+
+    def stop_capture(self):
+        self._capture.disable()
+        capture = self.captures[-1]
+        stats = pstats.Stats(self._capture)
+        capture['top'] = [
+            {'function': '{}:{}({})'.format(*func), 'calls': stat[1], 'cumtime_ms': round(stat[3] * 1000, 3)}
+            for func, stat in sorted(stats.stats.items(), key=lambda item: -item[1][3])[:15]
+        ]
+        if self.capture_dir:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            path = os.path.join(self.capture_dir, 'tick_{}.prof'.format(capture['slow_tick']))
+            stats.dump_stats(path)
+            capture['path'] = path
+        self._capture = None
+        self._capture_until = None
+
+    def summary(self):
+        """Сводка за матч: по методам, по дронам, по тикам и снятые профили
+
+        :return: dict
+        """
+        self.finish_tick()
+        self._tick = None
+        if self._capture is not None:
+            self.stop_capture()
+        drones = {}
+        for (name, drone_id), histogram in sorted(self.drones.items()):
+            drones.setdefault(str(drone_id), {})[name] = histogram.summary()
+        return {
+            'methods': {name: histogram.summary() for name, histogram in sorted(self.methods.items())},
+            'drones': drones,
+            'ticks': self.ticks.summary(),
+            'slow_ticks': self.slow_ticks,
+            'captures': self.captures,
+        }
+
+
+def instrument(drone_class, profiler=None, methods=CALLBACKS + HELPERS):
+    """Подменяем методы класса дрона обёртками с замером времени.
+    Без вызова этой функции дрон работает без каких-либо накладных расходов
+
+    :return: profiler
+    """
+    if drone_class.__dict__.get('profiler') is not None:
+        return drone_class.profiler
+    profiler = profiler or Profiler()
+    for name in methods:
+        method = getattr(drone_class, name, None)
+        if method is not None:
+            setattr(drone_class, name, profiler.wrap(name, method))
+    drone_class.profiler = profiler
+    return profiler
+
+
+def instrument_from_env(drone_class):
+    """Включаем замеры, если задана переменная окружения PAZUKHIN_PROFILE,
+    сводка пишется при завершении процесса в файл PAZUKHIN_PROFILE_OUT или в stderr.
+    PAZUKHIN_PROFILE_SLOW_MS включает снятие cProfile для медленных тиков
+    """
+    if not os.environ.get('PAZUKHIN_PROFILE'):
+        return None
+    slow_tick_ms = os.environ.get('PAZUKHIN_PROFILE_SLOW_MS')
+    profiler = instrument(drone_class, Profiler(
+        slow_tick_ms=float(slow_tick_ms) if slow_tick_ms else None,
+        capture_dir=os.environ.get('PAZUKHIN_PROFILE_DIR')))
+    atexit.register(dump_summary, profiler, os.environ.get('PAZUKHIN_PROFILE_OUT'))
+    return profiler
+
+
+def dump_summary(profiler, path=None):
+    """Пишем сводку профилировщика в файл JSON или в stderr"""
+    summary = json.dumps(profiler.summary(), indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w') as output:
+            output.write(summary)
+    else:
+        print(summary, file=sys.stderr)
@@ -0,0 +1,165 @@
+import bisect
+import json
+import mmap
+import struct
+
+MAGIC = b'PZRC'
+VERSION = 1
+# Заголовок файла: сигнатура, версия, длина описания матча в JSON
+HEADER = struct.Struct('<4sHI')
+# Номер тика в начале каждой записи
+TICK = struct.Struct('<I')
+# Состояние объекта в записи: x, y, направление, ресурс, здоровье, жив ли
+OBJECT = struct.Struct('<fffffB')
+
+
+class Recorder:
+    """Запись матча в двоичный файл: заголовок с описанием объектов и по записи фиксированной длины на тик
+
+    Набор объектов фиксируется на первом тике (дроны, базы, астероиды - снаряды не пишутся),
+    объект, пропавший со сцены, пишется в последнем известном состоянии.
+    Записи только дописываются в конец, поэтому файл можно читать через mmap прямо во время матча.
+    """
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self.output = None
+        self.objects = None
+        self.record = None
+        self.ticks = 0
+
+    def attach(self, scene):
+        """Пишем состояние сцены после каждого шага игры
+
+        :return: recorder
+        """
+        game_step = scene.game_step
+        recorder = self
+
+        def recorded_game_step():
+            game_step()
+            recorder.write(scene)
+
+        scene.game_step = recorded_game_step
+        return self
+
+    def start(self, scene):
+        """Фиксируем набор объектов и пишем заголовок"""
+        from robogame_engine.theme import theme
+        self.objects = [('drone', obj) for obj in scene.drones]
+        self.objects += [('mothership', obj) for obj in scene.motherships]
+        self.objects += [('asteroid', obj) for obj in scene.asteroids]
+        teams = []
+        for kind, obj in self.objects:
+            if obj.team is not None and obj.team not in teams:
+                teams.append(obj.team)
+        meta = {
+            'field': [theme.FIELD_WIDTH, theme.FIELD_HEIGHT],
+            'can_fight': bool(theme.DRONES_CAN_FIGHT),
+            'teams': teams,
+            'objects': [{
+                'id': obj.id,
+                'kind': kind,
+                'team': teams.index(obj.team) if obj.team is not None else -1,
+                'max_payload': obj.payload + obj.free_space,
+            } for kind, obj in self.objects],
+        }
+        encoded = json.dumps(meta, sort_keys=True).encode('utf-8')
+        self.record = record_struct(len(self.objects))
+        self.output = open(self.path, 'wb')
+        self.output.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        self.output.write(encoded)
+
+    def write(self, scene):
+        """Дописываем запись текущего тика"""
+        if self.output is None:
+            self.start(scene)
+        values = [scene._step]
+        for kind, obj in self.objects:
+            alive = obj.is_alive
+            values += (obj.x, obj.y, obj.direction, obj.payload, getattr(obj, 'health', 0) or 0, alive)
+        self.output.write(self.record.pack(*values))
+        self.ticks += 1
+        if self.ticks % self.flush_every == 0:
+            self.output.flush()
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+
+def record_struct(count):
+    """Формат записи тика для count объектов
+
+    :return: struct.Struct
+    """
+    return struct.Struct(TICK.format + OBJECT.format[1:] * count)
+
+
+class Recording:
+    """Чтение записи матча через mmap без загрузки файла в память
+
+    Запись тика с номером index лежит по смещению header_size + index * record_size,
+    недописанная последняя запись (матч ещё идёт) не учитывается.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.source = open(path, 'rb')
+        magic, version, meta_length = HEADER.unpack(self.source.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            self.source.close()
+            raise ValueError('{} не является записью матча версии {}'.format(path, VERSION))
+        self.meta = json.loads(self.source.read(meta_length).decode('utf-8'))
+        self.field = tuple(self.meta['field'])
+        self.teams = self.meta['teams']
+        self.objects = self.meta['objects']
+        self.header_size = HEADER.size + meta_length
+        self.record_size = record_struct(len(self.objects)).size
+        self.data = mmap.mmap(self.source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return (len(self.data) - self.header_size) // self.record_size
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.frame(index)
+
+    def tick(self, index):
+        return TICK.unpack_from(self.data, self.header_size + index * self.record_size)[0]
+
+    def frame(self, index):
+        """Тик и состояния всех объектов в порядке описания
+
+        :return: tick, список (x, y, direction, payload, health, alive)
+        """
+        offset = self.header_size + index * self.record_size
+        states = OBJECT.iter_unpack(self.data[offset + TICK.size:offset + self.record_size])
+        return self.tick(index), list(states)
+
+    def find(self, tick):
+        """Номер первой записи не раньше тика tick
+
+        :return: index
+        """
+        ticks = _TickView(self)
+        return bisect.bisect_left(ticks, tick)
+
+    def close(self):
+        self.data.close()
+        self.source.close()
+
+
+class _TickView:
+    """Номера тиков записи как последовательность для bisect"""
+
+    def __init__(self, recording):
+        self.recording = recording
+
+    def __len__(self):
+        return len(self.recording)
+
+    def __getitem__(self, index):
+        return self.recording.tick(index)
@@ -0,0 +1,185 @@
+import argparse
+import json
+import sys
+import time
+import traceback
+
+import pazukhin_standin
+from pazukhin_profiling import LatencyHistogram
+from pazukhin_recording import Recording
+
+DEFAULT_METHODS = ('on_heartbeat', 'plan_the_action')
+
+
+class Replay:
+    """Прогон решений нашего дрона по записи матча без движка
+
+    Объекты записи воссоздаются на классах локальной замены движка, перед каждым тиком
+    им выставляется записанное состояние, затем у наших живых дронов вызываются методы methods.
+    Команды, которые дроны отдают (движение, выстрелы), отбрасываются: мир меняется только по записи.
+    Замена движка регистрируется под именами astrobox и robogame_engine, поэтому прогон нужно
+    делать в отдельном процессе, где настоящий движок и бот ещё не импортированы.
+    """
+
+    def __init__(self, recording, bot='pazukhin_p_o:drone_class', team=None, methods=DEFAULT_METHODS):
+        pazukhin_standin.install()
+        from pazukhin_headless import load_class
+        self.recording = recording
+        self.methods = methods
+        bot_class = load_class(bot)
+        self.team = team or bot_class.__name__
+        if self.team not in recording.teams:
+            raise ValueError('В записи нет команды {}, есть: {}'.format(self.team, ', '.join(recording.teams)))
+        if bot_class.__name__ != self.team:
+            # Команда определяется по имени класса
+            bot_class = type(self.team, (bot_class,), {})
+        self.bot_class = bot_class
+        self.timings = {name: LatencyHistogram() for name in methods}
+        self.errors = []
+        self.decisions = []
+        self.ticks = 0
+        self.scene = None
+        self.objects = []
+        self.drones = []
+        self.build()
+
+    def build(self):
+        """Создаём сцену и объекты записи на классах замены движка"""
+        from astrobox.core import Asteroid, Drone, MotherShip
+        from astrobox.space_field import SpaceField
+        from robogame_engine.geometry import Point
+        recording = self.recording
+        self.scene = SpaceField(field=recording.field, can_fight=recording.meta['can_fight'])
+        team_classes = {self.team: self.bot_class}
+        for description in recording.objects:
+            team = recording.teams[description['team']] if description['team'] >= 0 else None
+            if description['kind'] == 'drone':
+                if team not in team_classes:
+                    team_classes[team] = type(team, (Drone,), {})
+                obj = team_classes[team]()
+            elif description['kind'] == 'mothership':
+                obj = MotherShip(coord=Point(0, 0), max_payload=description['max_payload'])
+                obj.set_team(team)
+                self.scene._motherships[team] = obj
+            else:
+                obj = Asteroid(coord=Point(0, 0), elerium=description['max_payload'])
+            obj.id = description['id']
+            self.objects.append(obj)
+        self.drones = [obj for obj in self.objects if isinstance(obj, self.bot_class)]
+
+    def apply(self, tick, states):
+        """Выставляем объектам записанное состояние тика"""
+        from robogame_engine.geometry import Point, Vector
+        self.scene._step = tick
+        for obj, (x, y, direction, payload, health, alive) in zip(self.objects, states):
+            obj.coord = Point(x, y)
+            obj.vector = Vector.from_direction(direction, module=1)
+            obj.cargo.payload = round(payload)
+            if hasattr(obj, '_health'):
+                obj._health = health if alive else 0
+
+    def discard_commands(self):
+        """Отбрасываем команды и события, которые дроны породили в этом тике"""
+        for obj in self.objects:
+            obj._commands.clear()
+            obj._events.clear()
+            gun = getattr(obj, 'gun', None)
+            if gun is not None:
+                gun.cooldown = 0
+        # Снаряды выстрелов не живут дольше тика
+        self.scene.objects = list(self.objects)
+
+    def call(self, drone, name):
+        started = time.perf_counter()
+        try:
+            getattr(drone, name)()
+        except Exception:
+            self.errors.append('tick {} drone {} {}: {}'.format(
+                self.scene._step, drone.id, name, traceback.format_exc()))
+        self.timings[name].add(time.perf_counter() - started)
+
+    def run(self, start=None, stop=None, every=1):
+        """Прогоняем записанные тики с start по stop, решения принимаются каждый every-й тик
+
+        :return: dict со сводкой прогона
+        """
+        recording = self.recording
+        first = recording.find(start) if start is not None else 0
+        last = recording.find(stop + 1) if stop is not None else len(recording)
+        started = time.perf_counter()
+        for index in range(first, last, every):
+            tick, states = recording.frame(index)
+            self.apply(tick, states)
+            if self.ticks == 0:
+                for drone in self.drones:
+                    self.call_born(drone)
+            for drone in self.drones:
+                if not drone.is_alive:
+                    continue
+                for name in self.methods:
+                    self.call(drone, name)
+                self.decisions.append({'tick': tick, 'drone': drone.id, 'decision': describe(drone.decision)})
+            self.discard_commands()
+            self.ticks += 1
+        return {
+            'ticks': self.ticks,
+            'wall_time': round(time.perf_counter() - started, 3),
+            'methods': {name: histogram.summary() for name, histogram in self.timings.items()},
+            'errors': len(self.errors),
+        }
+
+    def call_born(self, drone):
+        """Первый тик: подготовка дрона, как при его появлении в игре"""
+        try:
+            drone.on_born()
+        except Exception:
+            self.errors.append('drone {} on_born: {}'.format(drone.id, traceback.format_exc()))
+
+
+def describe(target):
+    """Цель решения в виде, пригодном для JSON
+
+    :return: dict или None
+    """
+    if target is None:
+        return None
+    description = {'x': round(target.x, 1), 'y': round(target.y, 1)}
+    if hasattr(target, 'id'):
+        description['id'] = target.id
+        description['kind'] = target.__class__.__name__
+    return description
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Прогон решений дрона по записи матча без движка')
+    parser.add_argument('recording', help='файл записи матча (pazukhin_headless.py --record)')
+    parser.add_argument('--bot', default='pazukhin_p_o:drone_class')
+    parser.add_argument('--team', help='команда записи, за которую играет бот (по умолчанию - имя класса)')
+    parser.add_argument('--methods', nargs='+', default=list(DEFAULT_METHODS),
+                        help='методы дрона, вызываемые на каждом тике')
+    parser.add_argument('--start', type=int, default=None, help='первый тик')
+    parser.add_argument('--stop', type=int, default=None, help='последний тик')
+    parser.add_argument('--every', type=int, default=1, help='принимать решения каждый N-й тик')
+    parser.add_argument('--decisions', help='файл JSONL для решений дронов по тикам')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    recording = Recording(args.recording)
+    try:
+        replay = Replay(recording, args.bot, args.team, tuple(args.methods))
+        summary = replay.run(args.start, args.stop, args.every)
+    finally:
+        recording.close()
+    if args.decisions:
+        with open(args.decisions, 'w') as output:
+            for decision in replay.decisions:
+                output.write(json.dumps(decision, sort_keys=True) + '\n')
+    for error in replay.errors[:3]:
+        print(error, file=sys.stderr)
+    print(json.dumps(summary, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
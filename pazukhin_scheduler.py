@@ -0,0 +1,107 @@
+class DecisionScheduler:
+    """Планировщик полных пересчётов решений дронов команды
+
+    События нескольких дронов часто приходят в одном тике, и каждый из них пересчитывал
+    всё решение целиком. Планировщик ограничивает это:
+    - дрон пересчитывает решение не чаще раза за тик, повторные события получают прошлое решение;
+    - необязательный пересчёт (дрон летит к ещё актуальной цели или стоит в обороне)
+      делается только в тике, отведённом дрону по my_id, и не больше budget раз за тик на команду,
+      но не реже чем раз в max_age тиков;
+    - отложенный необязательный пересчёт запоминается и выполняется по сердцебиению дрона
+      в его тике и в пределах бюджета, даже если новых событий у дрона не будет;
+    - дрон без актуального решения пересчитывает его сразу;
+    - срочный пересчёт (угроза здоровью или противник рядом) выполняется всегда.
+    """
+
+    def __init__(self, period=3, budget=2, max_age=30):
+        self.period = period
+        self.budget = budget
+        self.max_age = max_age
+        self.tick = None
+        self.spent = 0
+        self.last_plan = {}
+        self.decisions = {}
+        self.pending = set()
+        self.replans = 0
+        self.served = 0
+        self.deferred = 0
+
+    def has_decision(self, drone):
+        """Есть ли у дрона прошлое решение, которое можно продолжать выполнять:
+        полёт к цели, на которой ещё есть ресурс, или удержание позиции
+
+        :return: boolean
+        """
+        if drone.id not in self.decisions:
+            return False
+        target = self.decisions[drone.id]
+        if target is None:
+            return not drone.is_moving
+        return drone.is_moving and getattr(target, 'payload', None) != 0
+
+    def has_budget(self, tick):
+        """Остался ли у команды бюджет необязательных пересчётов в этом тике
+
+        :return: boolean
+        """
+        if tick != self.tick:
+            self.tick = tick
+            self.spent = 0
+        return self.spent < self.budget
+
+    def should_replan(self, drone, tick, urgent):
+        """Решаем, пересчитывать ли решение дрона в этом тике,
+        отказ в необязательном пересчёте запоминается до сердцебиения дрона
+
+        :return: boolean
+        """
+        slot = self.has_budget(tick) and tick % self.period == drone.my_id % self.period
+        last_plan = self.last_plan.get(drone.id)
+        if urgent:
+            replan = True
+        elif last_plan == tick:
+            replan = False
+        elif not self.has_decision(drone) or tick - last_plan >= self.max_age:
+            replan = True
+        else:
+            replan = slot
+            if not replan and drone.id not in self.pending:
+                self.pending.add(drone.id)
+                self.deferred += 1
+        if replan:
+            self.spent += 1
+            self.replans += 1
+            self.pending.discard(drone.id)
+        else:
+            self.served += 1
+        return replan
+
+    def should_replan_pending(self, drone, tick):
+        """Проверяем по сердцебиению, пора ли выполнить отложенный пересчёт дрона
+
+        :return: boolean
+        """
+        if drone.id not in self.pending or self.last_plan.get(drone.id) == tick:
+            return False
+        if not self.has_decision(drone):
+            # Решение устарело, пересчёт сразу сделает обработчик ближайшего события дрона
+            self.pending.discard(drone.id)
+            return False
+        if not self.has_budget(tick) or tick % self.period != drone.my_id % self.period:
+            return False
+        self.pending.discard(drone.id)
+        self.spent += 1
+        self.replans += 1
+        return True
+
+    def planned(self, drone, tick, decision):
+        """Запоминаем решение дрона: цель перемещения или None, если дрон остался на месте"""
+        self.last_plan[drone.id] = tick
+        self.decisions[drone.id] = decision
+
+    def stats(self):
+        """Статистика планировщика
+
+        :return: dict
+        """
+        return {'replans': self.replans, 'served': self.served, 'deferred': self.deferred}
@@ -0,0 +1,186 @@
+import math
+
+# Меньше этого числа объектов перебор списка дешевле сетки: не нужно обходить кольца ячеек
+GRID_MIN_OBJECTS = 40
+
+
+def build_index(objects, threshold=GRID_MIN_OBJECTS):
+    """Индекс для поиска ближайших объектов: перебор списка для небольшого числа объектов,
+    равномерная сетка для большого
+
+    :return: LinearIndex или UniformGrid
+    """
+    objects = list(objects)
+    if len(objects) < threshold:
+        return LinearIndex(objects)
+    return UniformGrid.adaptive(objects)
+
+
+class LinearIndex:
+    """Индекс с теми же запросами, что у UniformGrid, который просто перебирает объекты.
+    На сцене из нескольких десятков объектов это дешевле обхода ячеек сетки
+    """
+
+    def __init__(self, objects=()):
+        self.objects = list(objects)
+        self.ids = {obj.id for obj in self.objects}
+
+    def __len__(self):
+        return len(self.objects)
+
+    def insert(self, obj):
+        """Добавляем объект"""
+        self.objects.append(obj)
+        self.ids.add(obj.id)
+
+    def update(self, obj):
+        """Объекты хранятся без координат, переносить нечего, новый объект добавляется
+
+        :return: boolean - добавлен ли объект
+        """
+        if obj.id in self.ids:
+            return False
+        self.insert(obj)
+        return True
+
+    def nearest(self, point, predicate=None, max_distance=None):
+        """Ближайший к точке объект, удовлетворяющий условию
+
+        :param point: Point или игровой объект
+        :param predicate: функция от объекта, None - подходит любой
+        :param max_distance: не искать дальше этого расстояния
+        :return: obj, distance или None, None
+        """
+        px, py = point.x, point.y
+        best = None
+        best_distance = math.inf if max_distance is None else max_distance
+        for obj in self.objects:
+            distance = math.hypot(obj.x - px, obj.y - py)
+            if distance < best_distance or (best is None and distance == best_distance):
+                if predicate is None or predicate(obj):
+                    best = obj
+                    best_distance = distance
+        if best is None:
+            return None, None
+        return best, best_distance
+
+
+class UniformGrid:
+    """Равномерная сетка над игровыми объектами для поиска ближайших соседей
+
+    Объекты раскладываются по квадратным ячейкам со стороной cell_size,
+    запросы просматривают только ячейки рядом с точкой запроса.
+    Сетка хранит объекты, а не их координаты на момент вставки:
+    движущиеся объекты переносятся между ячейками через update.
+    """
+
+    def __init__(self, objects=(), cell_size=150):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.keys = {}
+        self.min_cell = None
+        self.max_cell = None
+        for obj in objects:
+            self.insert(obj)
+
+    def __len__(self):
+        return sum(len(cell) for cell in self.cells.values())
+
+    @classmethod
+    def adaptive(cls, objects, min_cell_size=150, per_cell=2):
+        """Сетка со стороной ячейки по плотности объектов: в среднем per_cell объектов на ячейку,
+        но не меньше min_cell_size. На большом поле с редкими объектами поиск ближайшего
+        тогда не перебирает множество пустых ячеек
+
+        :return: grid
+        """
+        objects = list(objects)
+        cell_size = min_cell_size
+        if len(objects) > 1:
+            xs = [obj.x for obj in objects]
+            ys = [obj.y for obj in objects]
+            area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+            cell_size = max(min_cell_size, math.sqrt(area * per_cell / len(objects)))
+        return cls(objects, cell_size)
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, obj):
+        """Добавляем объект в ячейку по его текущим координатам"""
+        cx, cy = self._cell(obj.x, obj.y)
+        self.cells.setdefault((cx, cy), []).append(obj)
+        self.keys[obj.id] = (cx, cy)
+        if self.min_cell is None:
+            self.min_cell = [cx, cy]
+            self.max_cell = [cx, cy]
+        else:
+            self.min_cell[0] = min(self.min_cell[0], cx)
+            self.min_cell[1] = min(self.min_cell[1], cy)
+            self.max_cell[0] = max(self.max_cell[0], cx)
+            self.max_cell[1] = max(self.max_cell[1], cy)
+
+    def update(self, obj):
+        """Переносим объект в ячейку по его текущим координатам, если он покинул прежнюю.
+        Границы сетки только расширяются, поэтому поиск остаётся верным
+
+        :return: boolean - сменилась ли ячейка
+        """
+        key = self._cell(obj.x, obj.y)
+        old = self.keys.get(obj.id)
+        if old == key:
+            return False
+        if old is not None:
+            cell = self.cells[old]
+            cell.remove(obj)
+            if not cell:
+                del self.cells[old]
+        self.insert(obj)
+        return True
+
+    def _ring(self, cx, cy, ring):
+        """Ячейки на границе квадрата с центром (cx, cy) и радиусом ring ячеек"""
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def _max_ring(self, cx, cy):
+        return max(cx - self.min_cell[0], self.max_cell[0] - cx,
+                   cy - self.min_cell[1], self.max_cell[1] - cy)
+
+    def nearest(self, point, predicate=None, max_distance=None):
+        """Ближайший к точке объект, удовлетворяющий условию
+
+        :param point: Point или игровой объект
+        :param predicate: функция от объекта, None - подходит любой
+        :param max_distance: не искать дальше этого расстояния
+        :return: obj, distance или None, None
+        """
+        if not self.cells:
+            return None, None
+        px, py = point.x, point.y
+        cx, cy = self._cell(px, py)
+        max_ring = self._max_ring(cx, cy)
+        if max_distance is not None:
+            max_ring = min(max_ring, int(max_distance // self.cell_size) + 1)
+        best = None
+        best_distance = None
+        for ring in range(max_ring + 1):
+            # Все объекты кольца ring не ближе (ring - 1) * cell_size от точки
+            if best is not None and best_distance <= (ring - 1) * self.cell_size:
+                break
+            for cell in self._ring(cx, cy, ring):
+                for obj in self.cells.get(cell, ()):
+                    distance = math.hypot(obj.x - px, obj.y - py)
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if (best is None or distance < best_distance) and (predicate is None or predicate(obj)):
+                        best = obj
+                        best_distance = distance
+        return best, best_distance
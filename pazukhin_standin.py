@@ -0,0 +1,816 @@
+import math
+import random
+import sys
+import traceback
+import types
+from collections import OrderedDict, deque
+
+
+class Theme:
+    """Константы темы astrobox по умолчанию"""
+    FIELD_WIDTH = 1200
+    FIELD_HEIGHT = 600
+    TEAMS_COUNT = 4
+    HEARTBEAT_INTERVAL = 5
+    MIN_ASTEROID_ELERIUM = 100
+    MAX_ASTEROID_ELERIUM = 200
+    MAX_DRONE_ELERIUM = 100
+    DRONE_SPEED = 3.77
+    DRONE_TURN_SPEED = 1.27
+    CARGO_TRANSITION_SPEED = 1
+    CARGO_TRANSITION_DISTANCE = 10
+    SLEEP_COUNTDOWN = 10
+    DRONES_CAN_FIGHT = False
+    DRONE_MAX_SHIELD = 100
+    DRONE_SHIELD_RENEWAL_RATE = 0.25
+    TEAM_DRONES_FRIENDLY_FIRE = True
+    MOTHERSHIP_MAX_SHIELD = 2000
+    MOTHERSHIP_SHIELD_RENEWAL_RATE = 0.15
+    MOTHERSHIP_HEALING_DISTANCE = 200
+    MOTHERSHIP_HEALING_RATE = 2
+    PROJECTILE_SPEED = 10
+    PROJECTILE_TTL = 60
+    PROJECTILE_DAMAGE = int(DRONE_MAX_SHIELD / 3.5)
+    PROJECTILE_MAX_DISTANCE = 580.0
+    PROJECTILE_RADIUS = 15
+    PLASMAGUN_COOLDOWN_TIME = 80
+    PLASMAGUN_COOLDOWN_RATE = 2
+    MAX_GAME_STEPS = 17000
+
+
+theme = Theme()
+
+
+class Point:
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def distance_to(self, other):
+        other = getattr(other, 'coord', other)
+        return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2)
+
+    def __add__(self, vector):
+        return Point(self.x + vector.x, self.y + vector.y)
+
+    def __iadd__(self, vector):
+        self.x += vector.x
+        self.y += vector.y
+        return self
+
+    def __repr__(self):
+        return 'p({:.1f},{:.1f})'.format(self.x, self.y)
+
+    def copy(self):
+        return self.__class__(self.x, self.y)
+
+
+class Vector:
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def from_points(cls, point1, point2, module=None):
+        x = float(point2.x - point1.x)
+        y = float(point2.y - point1.y)
+        if module:
+            current_module = math.hypot(x, y)
+            if current_module:
+                x *= module / current_module
+                y *= module / current_module
+        return cls(x, y)
+
+    @classmethod
+    def from_direction(cls, direction, module):
+        rad = math.radians(direction)
+        return cls(math.cos(rad) * module, math.sin(rad) * module)
+
+    @property
+    def direction(self):
+        return math.degrees(math.atan2(self.y, self.x)) % 360
+
+    @property
+    def module(self):
+        return math.hypot(self.x, self.y)
+
+    def rotate(self, delta):
+        rad = math.radians(self.direction + delta)
+        module = self.module
+        self.x = math.cos(rad) * module
+        self.y = math.sin(rad) * module
+
+    def __repr__(self):
+        return 'v({:.1f},{:.1f})'.format(self.direction, self.module)
+
+
+class GameObject:
+    """Игровой объект: события, команды, поворот и движение как в robogame_engine"""
+    radius = 10
+    auto_team = False
+    turning = True
+    _scene = None
+    _objects_count = 0
+
+    def __init__(self, coord=None, radius=None, direction=None):
+        scene = GameObject._scene
+        if scene is None:
+            raise RuntimeError('You must create Scene instance at first!')
+        if radius is not None:
+            self.radius = radius
+        self.coord = coord if coord else Point(0, 0)
+        GameObject._objects_count += 1
+        self.id = GameObject._objects_count
+        if direction is None:
+            direction = random.randint(0, 360)
+        self.vector = Vector.from_direction(direction, module=1)
+        self._team = None
+        self._events = deque()
+        self._commands = deque()
+        self._heartbeat_tics = theme.HEARTBEAT_INTERVAL
+        self._state = 'stopped'
+        self._target = None
+        self._speed = None
+        self._turn_vector = None
+        self._turn_speed = None
+        self._move_after_turn = False
+        scene.add_object(self)
+        self.add_event('on_born')
+
+    @property
+    def scene(self):
+        return GameObject._scene
+
+    @property
+    def team(self):
+        if self._team:
+            return self._team
+        if self.auto_team:
+            return self.__class__.__name__
+
+    def set_team(self, team_name):
+        self._team = team_name
+
+    @property
+    def x(self):
+        return self.coord.x
+
+    @property
+    def y(self):
+        return self.coord.y
+
+    @property
+    def direction(self):
+        return self.vector.direction
+
+    @property
+    def is_moving(self):
+        return self._state == 'moving'
+
+    def distance_to(self, obj):
+        return self.coord.distance_to(obj)
+
+    def near(self, obj):
+        return self.distance_to(obj) <= self.radius
+
+    def add_event(self, name, *args):
+        self._events.append((name, args))
+
+    def proceed_events(self):
+        while self._events:
+            name, args = self._events.popleft()
+            try:
+                getattr(self, name)(*args)
+            except Exception:
+                self.scene.register_error(self, name)
+
+    def proceed_commands(self):
+        while self._commands:
+            command, args = self._commands.popleft()
+            command(*args)
+
+    def game_step(self):
+        if self._state == 'turning':
+            self._step_turning()
+        elif self._state == 'moving':
+            self._step_moving()
+        self._check_runout()
+        self._heartbeat_tics -= 1
+        if not self._heartbeat_tics:
+            self.add_event('on_heartbeat')
+            self._heartbeat_tics = theme.HEARTBEAT_INTERVAL
+
+    def _target_point(self, target):
+        return target.coord if hasattr(target, 'coord') else target
+
+    def _start_move(self, target, speed):
+        point = self._target_point(target)
+        self._target = point
+        self._speed = speed
+        if self.turning:
+            self._state = 'turning'
+            self._turn_vector = Vector.from_points(self.coord, point, module=speed)
+            self._turn_speed = speed
+            self._move_after_turn = True
+        else:
+            self._state = 'moving'
+
+    def _start_turn(self, target, speed):
+        point = self._target_point(target)
+        self._state = 'turning'
+        self._target = point
+        self._turn_vector = Vector.from_points(self.coord, point, module=speed)
+        self._turn_speed = speed
+        self._move_after_turn = False
+
+    def _stop(self):
+        self._state = 'stopped'
+
+    def _step_turning(self):
+        delta = self._turn_vector.direction - self.direction
+        if abs(delta) < self._turn_speed:
+            self.vector = self._turn_vector
+            if self._move_after_turn:
+                self._state = 'moving'
+            else:
+                self._state = 'stopped'
+                self.add_event('on_stop')
+        elif -180 < delta < 0 or delta > 180:
+            self.vector.rotate(-self._turn_speed)
+        else:
+            self.vector.rotate(self._turn_speed)
+
+    def _step_moving(self):
+        distance_to_target = self.coord.distance_to(self._target)
+        if distance_to_target < self._speed:
+            self.coord += Vector.from_points(self.coord, self._target)
+            self._state = 'stopped'
+            self.add_event('on_stop_at_target', self._target)
+        else:
+            vector = Vector.from_points(self.coord, self._target, module=self._speed)
+            self.coord += vector
+            self.vector = vector
+
+    def _check_runout(self):
+        x = min(max(self.coord.x, self.radius + 1), theme.FIELD_WIDTH - self.radius - 1)
+        y = min(max(self.coord.y, self.radius + 1), theme.FIELD_HEIGHT - self.radius - 1)
+        if x != self.coord.x or y != self.coord.y:
+            self.coord.x, self.coord.y = x, y
+            self.stop()
+
+    def turn_to(self, target, speed=None):
+        if isinstance(target, (int, float)):
+            target = self.coord + Vector.from_direction(target, 500)
+        self._commands.append((self._start_turn, (target, speed or theme.DRONE_TURN_SPEED)))
+
+    def move_at(self, target, speed=None):
+        self._commands.append((self._start_move, (target, speed or theme.DRONE_SPEED)))
+
+    def stop(self):
+        self._commands.append((self._stop, ()))
+        self.add_event('on_stop')
+
+    def on_born(self):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_stop_at_target(self, target):
+        pass
+
+    def on_heartbeat(self):
+        pass
+
+    def __repr__(self):
+        return '{}({}, {})'.format(self.__class__.__name__, self.id, self.coord)
+
+
+class Cargo:
+
+    def __init__(self, owner, payload=0, max_payload=1):
+        self.owner = owner
+        self.max_payload = max_payload
+        self.payload = min(payload, max_payload)
+
+    @property
+    def free_space(self):
+        return self.max_payload - self.payload
+
+    @property
+    def is_empty(self):
+        return self.payload <= 0
+
+    @property
+    def is_full(self):
+        return self.payload >= self.max_payload
+
+
+class CargoTransition:
+
+    def __init__(self, cargo_from, cargo_to):
+        self.cargo_from = cargo_from
+        self.cargo_to = cargo_to
+        self.limit = max(min(cargo_to.free_space, cargo_from.payload), 0)
+        self.processed = 0
+        self.is_finished = False
+
+    def game_step(self):
+        if self.cargo_to.owner.distance_to(self.cargo_from.owner) >= theme.CARGO_TRANSITION_DISTANCE:
+            self.is_finished = True
+            return
+        batch = min(theme.CARGO_TRANSITION_SPEED, self.limit - self.processed,
+                    self.cargo_to.free_space, self.cargo_from.payload)
+        if batch <= 0:
+            self.is_finished = True
+            return
+        self.cargo_from.payload -= batch
+        self.cargo_to.payload += batch
+        self.processed += batch
+        if self.cargo_from.is_empty or self.cargo_to.is_full:
+            self.is_finished = True
+
+
+class Unit(GameObject):
+
+    def __init__(self, payload=0, max_payload=1, **kwargs):
+        super().__init__(**kwargs)
+        self._move_target = None
+        self._cargo = Cargo(self, payload=payload, max_payload=max_payload)
+        self._transition = None
+
+    @property
+    def cargo(self):
+        return self._cargo
+
+    @property
+    def payload(self):
+        return self._cargo.payload
+
+    @property
+    def is_full(self):
+        return self._cargo.is_full
+
+    @property
+    def free_space(self):
+        return self._cargo.free_space
+
+    def game_step(self):
+        if self._transition:
+            if not self._transition.is_finished:
+                self._transition.game_step()
+            if self._transition.is_finished:
+                transition = self._transition
+                self._transition = None
+                if transition.cargo_to is self._cargo:
+                    self.safe_call('on_load_complete')
+                if transition.cargo_from is self._cargo:
+                    self.safe_call('on_unload_complete')
+        super().game_step()
+
+    def safe_call(self, name):
+        try:
+            getattr(self, name)()
+        except Exception:
+            self.scene.register_error(self, name)
+
+    def move_at(self, target, speed=None):
+        if self._move_target == target:
+            return
+        self._move_target = target
+        super().move_at(target, speed=speed)
+
+    def load_from(self, source):
+        if self._cargo.free_space:
+            self._transition = CargoTransition(cargo_from=source.cargo, cargo_to=self._cargo)
+
+    def unload_to(self, target):
+        if not self._cargo.is_empty:
+            self._transition = CargoTransition(cargo_from=self._cargo, cargo_to=target.cargo)
+
+    def on_load_complete(self):
+        pass
+
+    def on_unload_complete(self):
+        pass
+
+
+class Projectile(GameObject):
+    radius = theme.PROJECTILE_RADIUS
+    turning = False
+
+    def __init__(self, owner, **kwargs):
+        self.owner = owner
+        self.ttl = theme.PROJECTILE_TTL
+        super().__init__(**kwargs)
+
+    def on_born(self):
+        target = self.owner.coord.copy() + Vector.from_direction(self.direction, theme.PROJECTILE_MAX_DISTANCE)
+        self._start_move(target, theme.PROJECTILE_SPEED)
+
+    def game_step(self):
+        if self.ttl <= 0:
+            self.scene.remove_object(self)
+            return
+        self.ttl -= 1
+        if self._state == 'moving':
+            self._step_moving()
+        for obj in self.scene.targets():
+            if obj is self.owner or not obj.is_alive:
+                continue
+            if not theme.TEAM_DRONES_FRIENDLY_FIRE and obj.team == self.owner.team:
+                continue
+            if int(obj.radius + self.radius - self.distance_to(obj)) > 1:
+                obj.damage_taken(theme.PROJECTILE_DAMAGE)
+                self.ttl = 0
+                return
+
+
+class Gun:
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.cooldown = 0
+
+    @property
+    def can_shot(self):
+        return self.cooldown <= 0
+
+    @property
+    def shot_distance(self):
+        return theme.PROJECTILE_MAX_DISTANCE
+
+    def shot(self, target):
+        if not self.owner.is_alive or not theme.DRONES_CAN_FIGHT or not self.can_shot:
+            return
+        self.cooldown = theme.PLASMAGUN_COOLDOWN_TIME
+        Projectile(owner=self.owner, coord=self.owner.coord.copy(), direction=self.owner.direction)
+
+    def game_step(self):
+        if self.cooldown > 0:
+            self.cooldown = max(self.cooldown - theme.PLASMAGUN_COOLDOWN_RATE, 0)
+
+
+class Drone(Unit):
+    radius = 44
+    auto_team = True
+
+    def __init__(self, **kwargs):
+        self._gun = Gun(self) if theme.DRONES_CAN_FIGHT else None
+        self._health = theme.DRONE_MAX_SHIELD
+        super().__init__(max_payload=theme.MAX_DRONE_ELERIUM, **kwargs)
+        self._sleep_state = None
+        self._sleep_countdown = theme.SLEEP_COUNTDOWN
+
+    @property
+    def gun(self):
+        return self._gun
+
+    @property
+    def gun_cooldown(self):
+        if self._gun:
+            return self._gun.cooldown
+
+    @property
+    def health(self):
+        return self._health
+
+    @property
+    def is_alive(self):
+        return self._health > 0
+
+    @property
+    def teammates(self):
+        return [mate for mate in self.scene.drones if mate is not self and mate.team == self.team and mate.is_alive]
+
+    @property
+    def mothership(self):
+        return self.scene.get_mothership(self.team)
+
+    @property
+    def my_mothership(self):
+        return self.mothership
+
+    @property
+    def asteroids(self):
+        return self.scene.asteroids
+
+    def damage_taken(self, damage=0):
+        self._health = max(self._health - damage, 0)
+        if self._health <= 0:
+            self.stop()
+
+    def _heal(self, healed_on):
+        if self._health > 0:
+            self._health = min(self._health + healed_on, theme.DRONE_MAX_SHIELD)
+
+    def game_step(self):
+        if not self.is_alive:
+            return
+        mothership = self.mothership
+        if mothership.is_alive and self.distance_to(mothership) < theme.MOTHERSHIP_HEALING_DISTANCE:
+            self._heal(theme.MOTHERSHIP_HEALING_RATE)
+        else:
+            self._heal(theme.DRONE_SHIELD_RENEWAL_RATE)
+        if self._gun:
+            self._gun.game_step()
+        super().game_step()
+        self._update_sleep_state()
+        if self._sleep_countdown <= 0:
+            self.add_event('on_wake_up')
+
+    def _update_sleep_state(self):
+        state = (self.coord.x, self.coord.y, self.vector.x, self.vector.y, self.payload, self.gun_cooldown)
+        if self._sleep_state != state:
+            self._sleep_state = state
+            self._sleep_countdown = theme.SLEEP_COUNTDOWN
+        elif self._sleep_countdown > 0:
+            self._sleep_countdown -= 1
+        else:
+            self._sleep_countdown = theme.SLEEP_COUNTDOWN
+
+    def move_at(self, target, speed=None):
+        if self.is_alive:
+            super().move_at(target, speed=theme.DRONE_SPEED)
+
+    def turn_to(self, target, speed=None):
+        if self.is_alive:
+            super().turn_to(target, speed=theme.DRONE_TURN_SPEED)
+
+    def on_stop_at_target(self, target):
+        for asteroid in self.asteroids:
+            if asteroid.near(target):
+                self.on_stop_at_asteroid(asteroid)
+                return
+        for ship in self.scene.motherships:
+            if ship.near(target):
+                self.on_stop_at_mothership(ship)
+                return
+        self.on_stop_at_point(target)
+
+    def on_stop_at_point(self, target):
+        pass
+
+    def on_stop_at_asteroid(self, asteroid):
+        pass
+
+    def on_stop_at_mothership(self, mothership):
+        pass
+
+    def on_wake_up(self):
+        pass
+
+
+class Asteroid(Unit):
+    radius = 50
+
+    def __init__(self, elerium=None, **kwargs):
+        super().__init__(payload=elerium, max_payload=elerium, **kwargs)
+
+    @property
+    def is_alive(self):
+        return False
+
+    def game_step(self):
+        pass
+
+
+class MotherShip(Unit):
+    radius = 90
+
+    def __init__(self, max_payload=0, **kwargs):
+        super().__init__(max_payload=max_payload, **kwargs)
+        self._health = theme.MOTHERSHIP_MAX_SHIELD
+
+    @property
+    def health(self):
+        return self._health
+
+    @property
+    def is_alive(self):
+        return self._health > 0
+
+    def damage_taken(self, damage=0):
+        self._health = max(self._health - damage, 0)
+
+    def game_step(self):
+        if self._health > 0:
+            self._health = min(self._health + theme.MOTHERSHIP_SHIELD_RENEWAL_RATE, theme.MOTHERSHIP_MAX_SHIELD)
+
+
+class SpaceField:
+    """Минимальная замена astrobox.space_field.SpaceField без графики
+
+    Повторяет правила движения, погрузки, стрельбы и окончания игры настоящего движка
+    в упрощённом виде: без столкновений дронов, анимаций и дрейфа обломков.
+    Матчи pazukhin_headless.py играются на ней, только если astrobox не установлен или она
+    запрошена явно (--engine standin). Replay и benchmark собирают сцены по объектам и выставляют
+    им состояние напрямую, а поле benchmark бывает и на 16 команд - для них она нужна всегда.
+    Оставлен только тот API движка, которым пользуются наши боты и эти инструменты.
+    """
+
+    def __init__(self, field=None, speed=1, headless=True, **kwargs):
+        if 'can_fight' in kwargs:
+            theme.DRONES_CAN_FIGHT = kwargs.pop('can_fight')
+        if field:
+            theme.FIELD_WIDTH, theme.FIELD_HEIGHT = field
+        self.init_kwargs = kwargs
+        self.objects = []
+        self._teams = OrderedDict()
+        self._motherships = OrderedDict()
+        self._drones = []
+        self._asteroids = []
+        self._step = 0
+        self._prev_endgame_state = {}
+        self._game_over_tics = 0
+        self.errors = []
+        GameObject._scene = self
+
+    def add_object(self, obj):
+        self.objects.append(obj)
+        if isinstance(obj, Drone):
+            self._drones.append(obj)
+            if obj.team not in self._teams:
+                if len(self._teams) >= theme.TEAMS_COUNT:
+                    raise RuntimeError('Only {} teams!'.format(theme.TEAMS_COUNT))
+                self._teams[obj.team] = []
+            self._teams[obj.team].append(obj)
+        elif isinstance(obj, Asteroid):
+            self._asteroids.append(obj)
+
+    def remove_object(self, obj):
+        if obj in self.objects:
+            self.objects.remove(obj)
+
+    def register_error(self, obj, name):
+        self.errors.append('{} {}: {}'.format(obj, name, traceback.format_exc()))
+
+    @property
+    def teams_count(self):
+        return len(self._teams)
+
+    @property
+    def drones(self):
+        return list(self._drones)
+
+    @property
+    def asteroids(self):
+        return list(self._asteroids)
+
+    @property
+    def motherships(self):
+        return list(self._motherships.values())
+
+    def get_mothership(self, team_name):
+        return self._motherships.get(team_name)
+
+    def targets(self):
+        return self._drones + list(self._motherships.values())
+
+    def _get_team_pos(self, team_number):
+        radius = MotherShip.radius
+        if team_number == 0:
+            return Point(radius, radius)
+        elif team_number == 1:
+            return Point(theme.FIELD_WIDTH - radius, radius)
+        elif team_number == 2:
+            return Point(radius, theme.FIELD_HEIGHT - radius)
+        elif team_number == 3 or self.teams_count <= 4:
+            return Point(theme.FIELD_WIDTH - radius, theme.FIELD_HEIGHT - radius)
+        # Больше четырёх команд настоящий движок не допускает: остальные базы - равномерно по краям поля
+        width, height = theme.FIELD_WIDTH - 2 * radius, theme.FIELD_HEIGHT - 2 * radius
+        position = (team_number - 4 + 0.5) / (self.teams_count - 4) * 2 * (width + height)
+        for length, start, step in ((width, (radius, radius), (1, 0)),
+                                    (height, (theme.FIELD_WIDTH - radius, radius), (0, 1)),
+                                    (width, (theme.FIELD_WIDTH - radius, theme.FIELD_HEIGHT - radius), (-1, 0)),
+                                    (height, (radius, theme.FIELD_HEIGHT - radius), (0, -1))):
+            if position <= length:
+                return Point(start[0] + step[0] * position, start[1] + step[1] * position)
+            position -= length
+        return Point(radius, radius)
+
+    def prepare(self, asteroids_count=5, **kwargs):
+        self._fill_space(asteroids_count)
+        diagonal = (theme.FIELD_WIDTH ** 2 + theme.FIELD_HEIGHT ** 2) ** .5
+        self._game_over_tics = int(diagonal / theme.DRONE_SPEED)
+
+    def _fill_space(self, asteroids_count, field_reduce_rate=1.5):
+        margin = MotherShip.radius * field_reduce_rate
+        width = theme.FIELD_WIDTH - margin * (2 if self.teams_count >= 2 else 1)
+        height = theme.FIELD_HEIGHT - margin * (2 if self.teams_count >= 3 else 1)
+        cells_in_width = int(math.ceil(math.sqrt(float(width) / height * asteroids_count)))
+        cells_in_height = int(math.ceil(float(asteroids_count) / cells_in_width))
+        cell_w = int(width / cells_in_width)
+        cell_h = int(height / cells_in_height)
+        jitter_w, jitter_h = int(cell_w * 0.7), int(cell_h * 0.7)
+        shift_w, shift_h = (cell_w - jitter_w) // 2, (cell_h - jitter_h) // 2
+        cell_numbers = list(range(cells_in_width * cells_in_height))
+        payloads = sorted((random.randint(theme.MIN_ASTEROID_ELERIUM, theme.MAX_ASTEROID_ELERIUM)
+                           for _ in range(asteroids_count)), reverse=True)
+        coords = []
+        for _ in range(asteroids_count):
+            cell_number = random.choice(cell_numbers)
+            cell_numbers.remove(cell_number)
+            x = margin + (cell_number % cells_in_width) * cell_w + shift_w + random.randint(0, jitter_w)
+            y = margin + (cell_number // cells_in_width) * cell_h + shift_h + random.randint(0, jitter_h)
+            coords.append(Point(x, y))
+        center = Point(cells_in_width * cell_w / 2, cells_in_height * cell_h / 2)
+        coords.sort(key=lambda c: c.distance_to(center))
+        for pos, payload in zip(coords, payloads):
+            Asteroid(coord=pos, elerium=payload)
+        max_elerium = max(round(sum(payloads), -2) + 100, 1000)
+        for i, team_name in enumerate(self._teams):
+            mothership = MotherShip(coord=self._get_team_pos(i), max_payload=max_elerium)
+            mothership.set_team(team_name)
+            self._motherships[team_name] = mothership
+        for drone in self._drones:
+            drone.coord = drone.mothership.coord.copy()
+
+    def game_step(self):
+        for obj in list(self.objects):
+            obj.proceed_events()
+            obj.proceed_commands()
+            obj.game_step()
+        for base in self._motherships.values():
+            if not base.is_alive:
+                continue
+            for drone in self._drones:
+                if drone.team == base.team:
+                    continue
+                dist = base.radius - base.distance_to(drone)
+                if dist >= 0:
+                    drone.coord += Vector.from_points(base.coord, drone.coord, module=dist + 3)
+
+    def _get_game_state(self):
+        state = {}
+        for team, drones in self._teams.items():
+            state[team] = {
+                'drones': sum(drone.payload if drone.is_alive else 0 for drone in drones),
+                'base': 0,
+                'low_health': sum(drone.health for drone in drones if drone.is_alive),
+            }
+        for ship in self._motherships.values():
+            state[ship.team]['base'] = ship.payload if ship.is_alive else 0
+            state[ship.team]['low_health'] += ship.health
+        return state
+
+    def get_game_result(self):
+        state = self._get_game_state()
+        if self._step > theme.MAX_GAME_STEPS:
+            return True, self._make_game_result(state)
+        if not self._prev_endgame_state:
+            self._prev_endgame_state = dict(state, countdown=self._game_over_tics)
+            return False, {}
+        for team in self._teams:
+            prev, cur = self._prev_endgame_state[team], state[team]
+            if prev['drones'] != cur['drones'] or prev['base'] != cur['base'] or (
+                    theme.DRONES_CAN_FIGHT and abs(prev['low_health'] - cur['low_health']) > 10):
+                self._prev_endgame_state = dict(state, countdown=self._game_over_tics)
+                return False, {}
+        self._prev_endgame_state['countdown'] -= 1
+        if self._prev_endgame_state['countdown'] <= 0:
+            return True, self._make_game_result(state)
+        return False, {}
+
+    def _make_game_result(self, state):
+        result = {'game_steps': self._step, 'collected': {}}
+        for team, stat in state.items():
+            result['collected'][team] = stat['drones'] + stat['base']
+        if theme.DRONES_CAN_FIGHT:
+            result['dead'] = {team: sum(1 for drone in drones if not drone.is_alive)
+                              for team, drones in self._teams.items()}
+        return result
+
+    def go(self):
+        self.prepare(**self.init_kwargs)
+        while True:
+            is_game_over, result = self.get_game_result()
+            if is_game_over:
+                return result
+            self._step += 1
+            self.game_step()
+
+
+def install():
+    """Регистрируем замену в sys.modules под именами astrobox и robogame_engine,
+    чтобы боты импортировали её так же, как настоящий движок
+    """
+    modules = {
+        'robogame_engine': {'GameObject': GameObject, 'Scene': SpaceField},
+        'robogame_engine.geometry': {'Point': Point, 'Vector': Vector},
+        'robogame_engine.theme': {'theme': theme},
+        'astrobox': {},
+        'astrobox.core': {'Drone': Drone, 'Asteroid': Asteroid, 'MotherShip': MotherShip, 'Unit': Unit},
+        'astrobox.space_field': {'SpaceField': SpaceField},
+        'astrobox.theme': {'theme': theme},
+    }
+    for name, attrs in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+    for name in modules:
+        if '.' in name:
+            parent, child = name.rsplit('.', 1)
+            setattr(sys.modules[parent], child, sys.modules[name])
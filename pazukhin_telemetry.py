@@ -0,0 +1,164 @@
+import atexit
+import csv
+import json
+from array import array
+
+COUNTERS = ('distance_empty', 'distance_half_full', 'distance_full', 'loads', 'unloads', 'shots', 'idle_steps')
+DISTANCE_COUNTERS = COUNTERS[:3]
+
+
+class TelemetryWriter:
+    """Пишет строки телеметрии в файл пачками: CSV, если имя оканчивается на .csv, иначе JSONL"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_csv = path.endswith('.csv')
+        self.output = None
+        self.writer = None
+
+    def write(self, rows):
+        """Дописываем пачку строк (tick, drone, счётчики...)"""
+        if self.output is None:
+            self.output = open(self.path, 'a', newline='' if self.is_csv else None)
+            if self.is_csv:
+                self.writer = csv.writer(self.output)
+                if self.output.tell() == 0:
+                    self.writer.writerow(('tick', 'drone') + COUNTERS)
+        if self.is_csv:
+            self.writer.writerows(rows)
+        else:
+            names = ('tick', 'drone') + COUNTERS
+            self.output.writelines(json.dumps(dict(zip(names, row))) + '\n' for row in rows)
+        self.output.flush()
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+
+class TeamTelemetry:
+    """Счётчики команды по дронам и тикам в заранее выделенных массивах
+
+    Приращения текущего тика копятся в массиве deltas (строка на дрона), при смене тика
+    ненулевые строки добавляются к итогам totals и переносятся в буфер пачки batch.
+    Заполненная пачка отдаётся writer, поэтому память не растёт с длиной матча.
+    Без writer строки по тикам не хранятся, остаются только итоги.
+    """
+
+    def __init__(self, writer=None, drones=7, batch_size=256):
+        self.writer = writer
+        self.width = len(COUNTERS)
+        self.rows = {}
+        self.ids = array('q', [0] * drones)
+        self.totals = array('d', [0.0] * (drones * self.width))
+        self.deltas = array('d', [0.0] * (drones * self.width))
+        self.dirty = array('b', [0] * drones)
+        self.batch_size = batch_size
+        self.batch = array('d', [0.0] * (batch_size * (2 + self.width)))
+        self.batched = 0
+        self.tick = None
+        self.summary_printed = False
+        if writer is not None:
+            atexit.register(self.close)
+
+    def row(self, drone_id):
+        """Строка дрона в массивах, для нового дрона при нехватке места массивы расширяются
+
+        :return: row
+        """
+        row = self.rows.get(drone_id)
+        if row is None:
+            row = len(self.rows)
+            if row == len(self.ids):
+                self.ids.append(0)
+                self.totals.extend([0.0] * self.width)
+                self.deltas.extend([0.0] * self.width)
+                self.dirty.append(0)
+            self.rows[drone_id] = row
+            self.ids[row] = drone_id
+        return row
+
+    def add(self, tick, drone_id, counter, value=1):
+        """Прибавляем value к счётчику counter дрона в тике tick"""
+        if tick != self.tick:
+            self.finish_tick()
+            self.tick = tick
+        row = self.row(drone_id)
+        self.deltas[row * self.width + COUNTERS.index(counter)] += value
+        self.dirty[row] = 1
+
+    def add_distance(self, tick, drone_id, payload, distance):
+        """Путь дрона по степени загрузки: пустой, частично заполненный, полный"""
+        if payload == 0:
+            self.add(tick, drone_id, 'distance_empty', distance)
+        elif payload == 100:
+            self.add(tick, drone_id, 'distance_full', distance)
+        elif 1 <= payload <= 99:
+            self.add(tick, drone_id, 'distance_half_full', distance)
+
+    def finish_tick(self):
+        """Переносим приращения прошедшего тика в итоги и в пачку"""
+        width = self.width
+        for row in range(len(self.rows)):
+            if not self.dirty[row]:
+                continue
+            start = row * width
+            offset = self.batched * (2 + width)
+            self.batch[offset] = self.tick
+            self.batch[offset + 1] = self.ids[row]
+            for i in range(width):
+                value = self.deltas[start + i]
+                self.totals[start + i] += value
+                self.batch[offset + 2 + i] = value
+                self.deltas[start + i] = 0.0
+            self.dirty[row] = 0
+            if self.writer is not None:
+                self.batched += 1
+                if self.batched == self.batch_size:
+                    self.flush()
+
+    def flush(self):
+        """Отдаём накопленную пачку строк writer"""
+        if self.writer is None or not self.batched:
+            return
+        step = 2 + self.width
+        rows = []
+        for index in range(self.batched):
+            values = self.batch[index * step:(index + 1) * step]
+            rows.append((int(values[0]), int(values[1])) + tuple(
+                round(value, 3) if name in DISTANCE_COUNTERS else int(value)
+                for name, value in zip(COUNTERS, values[2:])))
+        self.writer.write(rows)
+        self.batched = 0
+
+    def close(self):
+        """Дописываем последний тик и остаток пачки"""
+        self.finish_tick()
+        self.tick = None
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+    def team_totals(self):
+        """Итоги команды: сумма счётчиков всех дронов, включая текущий тик
+
+        :return: dict
+        """
+        totals = dict.fromkeys(COUNTERS, 0.0)
+        width = self.width
+        for row in range(len(self.rows)):
+            for i, name in enumerate(COUNTERS):
+                totals[name] += self.totals[row * width + i] + self.deltas[row * width + i]
+        return totals
+
+    def drone_totals(self, drone_id):
+        """Итоги дрона, включая текущий тик
+
+        :return: dict
+        """
+        row = self.rows.get(drone_id)
+        if row is None:
+            return dict.fromkeys(COUNTERS, 0.0)
+        start = row * self.width
+        return {name: self.totals[start + i] + self.deltas[start + i] for i, name in enumerate(COUNTERS)}
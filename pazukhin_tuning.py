@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+from pazukhin_headless import ENGINES, run_batch
+from pazukhin_params import SEARCH_SPACE, ParameterSet
+
+
+class ResultCache:
+    """Результаты матчей по ключу (параметры, зерно, условия матча) в файле JSONL
+
+    Файл только дописывается, поэтому прерванный подбор при повторном запуске
+    продолжается с того места, где остановился.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path) as source:
+                for line in source:
+                    line = line.strip()
+                    if line:
+                        record = json.loads(line)
+                        self.results[record['key']] = record['result']
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def __getitem__(self, key):
+        return self.results[key]
+
+    def add(self, key, result):
+        self.results[key] = result
+        if self.path:
+            with open(self.path, 'a') as output:
+                output.write(json.dumps({'key': key, 'result': result}, sort_keys=True) + '\n')
+
+
+def sample_params(rng, names):
+    """Случайный набор параметров из SEARCH_SPACE, остальные - по умолчанию
+
+    :return: ParameterSet
+    """
+    overrides = {}
+    for name in names:
+        low, high, kind = SEARCH_SPACE[name]
+        overrides[name] = rng.randint(low, high) if kind is int else round(rng.uniform(low, high), 3)
+    return ParameterSet(**overrides)
+
+
+# Вес темпа сбора: обычные 0.1 ресурса за тик дают слагаемое порядка победы и доли
+RATE_WEIGHT = 10.0
+
+
+def match_score(result):
+    """Оценка матча: победа, доля собранного нами ресурса и темп сбора - ресурс за тик игры.
+    Уничтожив противника, любой кандидат получает победу и всю долю,
+    различает таких кандидатов темп: больше ресурса и раньше победа
+
+    :return: float
+    """
+    total = sum(result['collected'].values())
+    share = result['elerium'] / total if total else 0.0
+    steps = result.get('ticks_to_win') or result.get('game_steps')
+    rate = result['elerium'] / steps if steps else 0.0
+    return (1.0 if result['won'] else 0.0) + share + RATE_WEIGHT * rate
+
+
+class Tuner:
+    """Подбор параметров стратегии по результатам матчей без графики"""
+
+    def __init__(self, settings, cache, workers=None):
+        self.settings = settings
+        self.cache = cache
+        self.workers = workers
+
+    def match_key(self, params, seed):
+        return json.dumps({'params': params.as_dict(), 'seed': seed, 'settings': self.settings}, sort_keys=True)
+
+    def evaluate(self, candidates, seeds):
+        """Играем недостающие матчи всех кандидатов на всех зёрнах параллельно
+
+        :return: список средних оценок кандидатов
+        """
+        missing = {}
+        for params in candidates:
+            for seed in seeds:
+                key = self.match_key(params, seed)
+                if key not in self.cache and key not in missing:
+                    missing[key] = dict(self.settings, seed=seed, params=params.as_dict(), tag=key)
+        if missing:
+            for result in run_batch(list(missing.values()), self.workers):
+                self.cache.add(result.pop('tag'), result)
+        return [sum(match_score(self.cache[self.match_key(params, seed)]) for seed in seeds) / len(seeds)
+                for params in candidates]
+
+    def random_search(self, candidates, seeds):
+        """Все кандидаты на всех зёрнах
+
+        :return: список (оценка, параметры) по убыванию оценки
+        """
+        scores = self.evaluate(candidates, seeds)
+        return sorted(zip(scores, candidates), key=lambda item: -item[0])
+
+    def successive_halving(self, candidates, seeds, eta=2, min_seeds=2):
+        """Последовательное деление: все кандидаты играют на min_seeds зёрнах,
+        лучшая 1/eta часть переходит в следующий раунд с eta-кратным числом зёрен
+
+        :return: список (оценка, параметры) последнего раунда по убыванию оценки
+        """
+        budget = min_seeds
+        ranked = [(0.0, params) for params in candidates]
+        while True:
+            round_seeds = seeds[:budget]
+            scores = self.evaluate([params for _, params in ranked], round_seeds)
+            ranked = sorted(zip(scores, [params for _, params in ranked]), key=lambda item: -item[0])
+            print('round: candidates={} seeds={} best={:.3f}'.format(len(ranked), len(round_seeds), ranked[0][0]))
+            if len(ranked) == 1 or budget >= len(seeds):
+                return ranked
+            ranked = ranked[:max(1, len(ranked) // eta)]
+            budget = min(budget * eta, len(seeds))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Подбор параметров стратегии PazukhinDrone')
+    parser.add_argument('--method', choices=('random', 'halving'), default='halving')
+    parser.add_argument('--candidates', type=int, default=16)
+    parser.add_argument('--seeds', type=int, default=8, help='число зёрен матчей (для halving - наибольшее)')
+    parser.add_argument('--first-seed', type=int, default=1)
+    parser.add_argument('--search-seed', type=int, default=0, help='зерно выбора кандидатов')
+    parser.add_argument('--tune', nargs='*', default=sorted(SEARCH_SPACE),
+                        help='подбираемые параметры, остальные остаются по умолчанию')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--opponent', default='pazukhin_opponents:drone_class')
+    parser.add_argument('--drones', type=int, default=5)
+    parser.add_argument('--asteroids', type=int, default=20)
+    parser.add_argument('--field', type=int, nargs=2, default=(1200, 1200))
+    parser.add_argument('--engine', choices=ENGINES, default='auto')
+    parser.add_argument('--cache', default='tuning_cache.jsonl', help='файл кэша результатов')
+    parser.add_argument('--best-output', default='best_params.json', help='куда записать лучшую конфигурацию')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = set(args.tune) - set(SEARCH_SPACE)
+    if unknown:
+        raise SystemExit('Неизвестные параметры: {}'.format(', '.join(sorted(unknown))))
+    settings = {
+        'engine': args.engine,
+        'bot': 'pazukhin_p_o:drone_class',
+        'opponent': args.opponent,
+        'drones': args.drones,
+        'asteroids': args.asteroids,
+        'field': list(args.field),
+        'can_fight': True,
+    }
+    rng = random.Random(args.search_seed)
+    # Значения по умолчанию всегда участвуют, чтобы было с чем сравнивать
+    candidates = [ParameterSet()]
+    while len(candidates) < args.candidates:
+        params = sample_params(rng, args.tune)
+        if params not in candidates:
+            candidates.append(params)
+    seeds = list(range(args.first_seed, args.first_seed + args.seeds))
+    tuner = Tuner(settings, ResultCache(args.cache), args.workers)
+    if args.method == 'random':
+        ranked = tuner.random_search(candidates, seeds)
+    else:
+        ranked = tuner.successive_halving(candidates, seeds)
+    best_score, best = ranked[0]
+    default_score = next((score for score, params in ranked if params == ParameterSet()), None)
+    best.save(args.best_output)
+    print(json.dumps({
+        'best_score': round(best_score, 4),
+        'default_score': None if default_score is None else round(default_score, 4),
+        'changed': best.overrides(),
+        'saved_to': args.best_output,
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_COS_30 = math.cos(math.radians(30))
+# Меньше этого числа пар накладные расходы numpy (создание массивов, tolist) дороже обычного перебора
+NUMPY_MIN_PAIRS = 100
+
+
+def coords_array(objects):
+    """Координаты объектов в виде массива формы (N, 2)
+
+    :return: numpy.ndarray
+    """
+    return numpy.array([(obj.x, obj.y) for obj in objects], dtype=float).reshape(-1, 2)
+
+
+def threat_matrix(threats, objects, shot_distance, block_size=1 << 20):
+    """Для каждого объекта определяем, находится ли он под огнём, и расстояние до ближайшей угрозы
+
+    Матрица расстояний объекты x угрозы считается блоками строк не больше block_size элементов,
+    чтобы память не росла как произведение размеров. Без numpy и для меньше NUMPY_MIN_PAIRS пар
+    (например, одного объекта в check_urgent) используется обычный перебор пар.
+
+    :param threats: вражеские дроны
+    :param objects: проверяемые объекты
+    :return: under_fire (список boolean), nearest (список расстояний или None, если угроз нет)
+    """
+    if not threats or not objects:
+        return [False] * len(objects), [None] * len(objects)
+    if numpy is None or len(threats) * len(objects) < NUMPY_MIN_PAIRS:
+        return _threat_matrix_python(threats, objects, shot_distance)
+    threat_coords = coords_array(threats)
+    object_coords = coords_array(objects)
+    rows = max(1, block_size // len(threats))
+    nearest = numpy.empty(len(objects))
+    for start in range(0, len(objects), rows):
+        delta = object_coords[start:start + rows, None, :] - threat_coords[None, :, :]
+        nearest[start:start + rows] = numpy.hypot(delta[..., 0], delta[..., 1]).min(axis=1)
+    return (nearest <= shot_distance).tolist(), nearest.tolist()
+
+
+def _threat_matrix_python(threats, objects, shot_distance):
+    under_fire = []
+    nearest = []
+    for obj in objects:
+        distance = min(math.hypot(obj.x - threat.x, obj.y - threat.y) for threat in threats)
+        under_fire.append(distance <= shot_distance)
+        nearest.append(distance)
+    return under_fire, nearest
+
+
+def firing_line_clearance(positions, teammates, target):
+    """Проверяем сразу все позиции стрельбы по цели на безопасность для наших teammates
+
+    Позиция небезопасна, если какой-либо союзник ближе 20 к линии огня,
+    находится под углом меньше 30 градусов к линии огня ближе 45 к позиции,
+    ближе 25 к позиции или ближе 20 к цели.
+    Запас - минимальное по союзникам превышение расстояний до линии огня и до позиции над порогами.
+    В игре позиций не больше десятка, а союзников - несколько, при таком числе пар
+    numpy дороже обычного перебора, поэтому проверка идёт одним проходом без него.
+
+    :param positions: точки, из которых собираемся стрелять
+    :param teammates: союзники
+    :param target: точка цели
+    :return: safe (список boolean), margins (список запасов)
+    """
+    tx, ty = target.x, target.y
+    safe = []
+    margins = []
+    for position in positions:
+        px, py = position.x, position.y
+        line_len = math.hypot(tx - px, ty - py)
+        is_safe = True
+        margin = math.inf
+        for teammate in teammates:
+            mx, my = teammate.x, teammate.y
+            to_mate = math.hypot(mx - px, my - py)
+            if line_len > 0:
+                line_dist = abs((ty - py) * mx - (tx - px) * my + tx * py - ty * px) / line_len
+            else:
+                line_dist = to_mate
+            mate_to_target = math.hypot(mx - tx, my - ty)
+            cos = ((px - tx) * (mx - tx) + (py - ty) * (my - ty)) / (line_len * mate_to_target + 1.e-8)
+            if line_dist < 20 or (cos > _COS_30 and to_mate < 45) or to_mate < 25 or mate_to_target < 20:
+                is_safe = False
+            margin = min(margin, line_dist - 20, to_mate - 25)
+        safe.append(is_safe)
+        margins.append(margin)
+    return safe, margins
+
+
+def estimate_velocities(positions, ticks, cursors, rows, history, lag):
+    """Оцениваем скорости дронов по кольцевым буферам положений одним проходом
+
+    Скорость - смещение между последним положением и положением на lag записей раньше,
+    делённое на прошедшие тики. Если записей меньше двух, скорость нулевая.
+
+    :param positions: плоский буфер array('d') формы (строки, history, 2)
+    :param ticks: плоский буфер array('d') формы (строки, history) с тиками записей
+    :param cursors: array('q') - число записей в каждой строке
+    :param rows: номера строк интересующих дронов
+    :return: список скоростей (vx, vy)
+    """
+    if not rows:
+        return []
+    if numpy is None:
+        return _estimate_velocities_python(positions, ticks, cursors, rows, history, lag)
+    rows = numpy.asarray(rows)
+    all_positions = numpy.frombuffer(positions, dtype=float).reshape(-1, history, 2)
+    all_ticks = numpy.frombuffer(ticks, dtype=float).reshape(-1, history)
+    count = numpy.frombuffer(cursors, dtype=numpy.int64)[rows]
+    back = numpy.minimum(lag, numpy.maximum(numpy.minimum(count, history) - 1, 0))
+    newest = (count - 1) % history
+    oldest = (count - 1 - back) % history
+    dt = all_ticks[rows, newest] - all_ticks[rows, oldest]
+    shift = all_positions[rows, newest] - all_positions[rows, oldest]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        velocities = numpy.where(dt[:, None] > 0, shift / dt[:, None], 0.0)
+    return velocities.tolist()
+
+
+def _estimate_velocities_python(positions, ticks, cursors, rows, history, lag):
+    velocities = []
+    for row in rows:
+        count = cursors[row]
+        back = min(lag, max(min(count, history) - 1, 0))
+        newest = row * history + (count - 1) % history
+        oldest = row * history + (count - 1 - back) % history
+        dt = ticks[newest] - ticks[oldest]
+        if dt > 0:
+            velocities.append(((positions[2 * newest] - positions[2 * oldest]) / dt,
+                               (positions[2 * newest + 1] - positions[2 * oldest + 1]) / dt))
+        else:
+            velocities.append((0.0, 0.0))
+    return velocities
+
+
+def intercept_points(shooters, targets, velocities, speed, max_time):
+    """Точки упреждения для всех пар стрелок x цель одним проходом
+
+    Время встречи t - положительный корень |D + V t| = speed * t, где D - вектор от стрелка к цели.
+    Если цель быстрее снаряда или встреча позже max_time, упреждение ограничивается max_time.
+
+    :param shooters: список (x, y) стрелков
+    :param targets: список (x, y) целей
+    :param velocities: список (vx, vy) целей
+    :return: матрица стрелки x цели точек (x, y)
+    """
+    if not shooters or not targets:
+        return [[] for _ in shooters]
+    if numpy is None:
+        return _intercept_points_python(shooters, targets, velocities, speed, max_time)
+    shooters = numpy.asarray(shooters, dtype=float)[:, None, :]
+    targets = numpy.asarray(targets, dtype=float)[None, :, :]
+    velocities = numpy.asarray(velocities, dtype=float)[None, :, :]
+    delta = targets - shooters
+    a = (velocities ** 2).sum(axis=-1) - speed ** 2
+    b = 2 * (delta * velocities).sum(axis=-1)
+    c = (delta ** 2).sum(axis=-1)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        root = numpy.sqrt(numpy.maximum(b ** 2 - 4 * a * c, 0.0))
+        time = numpy.where(a < 0, (-b - root) / (2 * a), max_time)
+    time = numpy.clip(numpy.nan_to_num(time, nan=max_time), 0.0, max_time)
+    return (targets + velocities * time[..., None]).tolist()
+
+
+def _intercept_points_python(shooters, targets, velocities, speed, max_time):
+    points = []
+    for sx, sy in shooters:
+        row = []
+        for (tx, ty), (vx, vy) in zip(targets, velocities):
+            dx, dy = tx - sx, ty - sy
+            a = vx * vx + vy * vy - speed * speed
+            b = 2 * (dx * vx + dy * vy)
+            c = dx * dx + dy * dy
+            if a < 0:
+                time = (-b - math.sqrt(max(b * b - 4 * a * c, 0.0))) / (2 * a)
+            else:
+                time = max_time
+            time = min(max(time, 0.0), max_time)
+            row.append((tx + vx * time, ty + vy * time))
+        points.append(row)
+    return points
@@ -0,0 +1,505 @@
+import bisect
+import functools
+from collections import OrderedDict
+
+from robogame_engine.theme import theme
+
+from pazukhin_background import BackgroundPlanner, FrozenWorld
+from pazukhin_motion import EnemyMotion
+from pazukhin_planning import DistanceMatrix, TeamAssignment
+from pazukhin_scheduler import DecisionScheduler
+from pazukhin_spatial import build_index
+from pazukhin_telemetry import TeamTelemetry, TelemetryWriter
+from pazukhin_vectorized import threat_matrix
+
+
+class WorldTracker:
+    """Состояние мира для команды, которое обновляется изменениями, а не пересборкой
+
+    Списки живых противников, обломков с ресурсом и непустых астероидов собираются один раз,
+    индексы астероидов и баз строятся один раз, индекс дронов - один раз и дальше правится на месте.
+    refresh раз в тик проходит по известным дронам: переносит в индексе тех, кто сменил ячейку,
+    переводит погибших в обломки, если в трюме остался ресурс, и замечает конец погрузки -
+    трюм рос на прошлом обновлении и перестал. Движок не сообщает о гибели чужих дронов
+    и о выгрузке чужих астероидов, но ресурс уходит только в трюм дрона рядом с источником,
+    поэтому опустевший астероид или обломок ищется лишь возле дрона, закончившего погрузку,
+    а не перебором всех объектов с ресурсом.
+    Живых баз единицы, их is_alive опрашивается. Новые дроны ищутся,
+    только если изменилось число объектов сцены.
+    Списки меняются на месте, поэтому ссылки на них (например, self.enemies дрона) остаются верными.
+    """
+
+    def __init__(self, scene, team, my_mothership, asteroids):
+        self.scene = scene
+        self.team = team
+        self.my_mothership = my_mothership
+        self.tick = None
+        self.changes = 0
+        self.enemies = {'motherships': [], 'drones': []}
+        # Живые вражеские дроны по id своей живой базы
+        self.guards = {}
+        self.drones = []
+        self.alive_drones = []
+        self.alive_motherships = []
+        self.dead_drones = []
+        self.dead_motherships = []
+        self.asteroids = [asteroid for asteroid in asteroids if asteroid.payload != 0]
+        self.loot = []
+        self._loot_keys = []
+        # id отслеживаемых непустых астероидов и обломков
+        self._stocked = set()
+        # Ресурс в трюме живых дронов на прошлом обновлении и id дронов, чей трюм тогда рос
+        self._payloads = {}
+        self._loading = set()
+        self._known_objects = 0
+        # Астероиды и базы неподвижны, их индексы строятся один раз за игру.
+        # Вид индекса выбирается по числу объектов: на обычной сцене это перебор списка
+        self.asteroid_index = build_index(asteroids)
+        self.mothership_index = build_index(scene.motherships)
+        self.drone_index = build_index(scene.drones)
+        for asteroid in self.asteroids:
+            self._stocked.add(asteroid.id)
+            self.add_loot(asteroid)
+        for mothership in scene.motherships:
+            if mothership.is_alive:
+                self.alive_motherships.append(mothership)
+                if mothership != my_mothership:
+                    self.enemies['motherships'].append(mothership)
+                    self.guards[mothership.id] = []
+            else:
+                self.add_wreck(mothership, self.dead_motherships)
+        self.add_new_drones()
+
+    def base_distance(self, obj):
+        return self.my_mothership.distance_to(obj)
+
+    def add_new_drones(self):
+        """Учитываем дронов, появившихся на сцене после прошлого обновления"""
+        drones = self.scene.drones
+        for drone in drones[len(self.drones):]:
+            self.drones.append(drone)
+            self.drone_index.update(drone)
+            if drone.is_alive:
+                self.alive_drones.append(drone)
+                self._payloads[drone.id] = drone.payload
+                if drone.team != self.team:
+                    self.enemies['drones'].append(drone)
+                    mothership = drone.my_mothership
+                    if mothership is not None and mothership.id in self.guards:
+                        self.guards[mothership.id].append(drone)
+            else:
+                self.add_wreck(drone, self.dead_drones)
+        self._known_objects = len(self.scene.objects)
+
+    def add_wreck(self, obj, wrecks):
+        """Новый обломок с ресурсом, вражеские обломки становятся добычей"""
+        if obj.payload == 0:
+            return
+        wrecks.append(obj)
+        self._stocked.add(obj.id)
+        if obj.team != self.team:
+            self.add_loot(obj)
+
+    def add_loot(self, obj):
+        """Вставляем объект в список добычи, отсортированный по удалению от нашей базы"""
+        key = self.base_distance(obj)
+        index = bisect.bisect_right(self._loot_keys, key)
+        self._loot_keys.insert(index, key)
+        self.loot.insert(index, obj)
+
+    def remove_loot(self, obj):
+        index = self.loot.index(obj)
+        del self.loot[index]
+        del self._loot_keys[index]
+
+    def refresh(self, tick):
+        """Применяем изменения с прошлого обновления, не чаще раза за тик
+
+        :return: boolean - было ли обновление
+        """
+        if tick == self.tick:
+            return False
+        elapsed = tick - self.tick if self.tick is not None else 1
+        self.tick = tick
+        if len(self.scene.objects) != self._known_objects:
+            self.add_new_drones()
+        payloads = self._payloads
+        loading = self._loading
+        loaded = []
+        for drone in self.drones:
+            self.drone_index.update(drone)
+            payload = payloads.get(drone.id)
+            if payload is None:
+                continue
+            if not drone.is_alive:
+                del payloads[drone.id]
+                if drone.id in loading:
+                    loading.discard(drone.id)
+                    loaded.append(drone)
+                self.on_drone_death(drone)
+            elif drone.payload > payload:
+                payloads[drone.id] = drone.payload
+                loading.add(drone.id)
+            else:
+                payloads[drone.id] = drone.payload
+                if drone.id in loading:
+                    # Погрузка закончилась: источник опустел, трюм полон или дрон улетел
+                    loading.discard(drone.id)
+                    loaded.append(drone)
+        for mothership in remove_where(self.alive_motherships, lambda mothership: not mothership.is_alive):
+            if mothership != self.my_mothership:
+                self.enemies['motherships'].remove(mothership)
+                self.guards.pop(mothership.id, None)
+            self.add_wreck(mothership, self.dead_motherships)
+            self.changes += 1
+        if loaded:
+            # Источник ресурса был ближе дистанции переноса, с прошлого обновления дрон мог отлететь
+            reach = theme.CARGO_TRANSITION_DISTANCE + theme.DRONE_SPEED * elapsed
+            for drone in loaded:
+                self.check_drained(drone, reach)
+        return True
+
+    def on_drone_death(self, drone):
+        """Дрон погиб: убираем его из живых и противников, трюм с ресурсом становится обломком"""
+        self.alive_drones.remove(drone)
+        if drone.team != self.team:
+            self.enemies['drones'].remove(drone)
+            guards = self.guards.get(drone.my_mothership.id) if drone.my_mothership is not None else None
+            if guards is not None and drone in guards:
+                guards.remove(drone)
+        self.add_wreck(drone, self.dead_drones)
+        self.changes += 1
+
+    def check_drained(self, loader, reach):
+        """Ищем возле дрона, набравшего ресурс, опустевший астероид или обломок и перестаём его отслеживать"""
+        stocked = self._stocked
+
+        def drained(obj):
+            return obj.id in stocked and obj.payload == 0 and obj is not loader
+
+        for index, objects in [(self.asteroid_index, self.asteroids), (self.drone_index, self.dead_drones),
+                               (self.mothership_index, self.dead_motherships)]:
+            # Рядом может оказаться и другой опустевший объект, поэтому ищем, пока находятся
+            while True:
+                obj, _ = index.nearest(loader, drained, max_distance=reach)
+                if obj is None:
+                    break
+                stocked.discard(obj.id)
+                objects.remove(obj)
+                if obj in self.loot:
+                    self.remove_loot(obj)
+                self.changes += 1
+
+
+def remove_where(items, predicate):
+    """Удаляем из списка на месте элементы, для которых predicate истинен
+
+    :return: удалённые элементы
+    """
+    removed = []
+    for index in range(len(items) - 1, -1, -1):
+        if predicate(items[index]):
+            removed.append(items[index])
+            del items[index]
+    removed.reverse()
+    return removed
+
+
+class WorldSnapshot:
+    """Снимок мира на один игровой тик, общий для всех дронов команды
+
+    Первый дрон, которому в этом тике понадобилась информация о мире, строит снимок,
+    остальные переиспользуют его до смены тика. Списки противников, обломков и астероидов
+    и индексы объектов берутся из WorldTracker, снимок только кэширует расчёты этого тика.
+    """
+
+    def __init__(self, drone, tick, tracker):
+        self.tick = tick
+        self.team = drone.team
+        self.my_mothership = drone.my_mothership
+        self.tracker = tracker
+        self.enemies = tracker.enemies
+        self.dead_motherships = tracker.dead_motherships
+        self.dead_drones = tracker.dead_drones
+        self.asteroids = tracker.asteroids
+        self.asteroid_index = tracker.asteroid_index
+        self.mothership_index = tracker.mothership_index
+        self.drone_index = tracker.drone_index
+        self.plan = None
+        self._distances = {}
+        self._on_fire = {}
+        self._threat_distances = {}
+        self._protected = {}
+        self._unprotected_motherships = None
+        self._loot = None
+
+    def distance(self, left, right):
+        """Расстояние между двумя объектами, считается один раз за тик
+
+        :return: distance
+        """
+        key = (left.id, right.id)
+        distance = self._distances.get(key)
+        if distance is None:
+            distance = left.distance_to(right)
+            self._distances[key] = distance
+            self._distances[(right.id, left.id)] = distance
+        return distance
+
+    def base_distance(self, obj):
+        """Расстояние от нашей базы до объекта
+
+        :return: distance
+        """
+        return self.distance(self.my_mothership, obj)
+
+    def is_on_fire(self, obj, shot_distance):
+        """Находится ли объект в зоне досягаемости вражеских орудий
+
+        :return: boolean
+        """
+        on_fire = self._on_fire.get(obj.id)
+        if on_fire is None:
+            enemy, _ = self.drone_index.nearest(obj, self.is_enemy_drone, max_distance=shot_distance)
+            on_fire = enemy is not None
+            self._on_fire[obj.id] = on_fire
+        return on_fire
+
+    def is_enemy_drone(self, obj):
+        """Живой ли это вражеский дрон
+
+        :return: boolean
+        """
+        return obj.is_alive and obj.team != self.team
+
+    def is_protected(self, enemy):
+        """Находится ли противник под защитой: вражеский дрон - у своей базы дальше 50 и не дальше 300,
+        вражеская база - если рядом с ней (дальше 50 и не дальше 350) есть её живой дрон.
+        Защитники берутся из индекса трекера по базам, проверка не зависит от числа дронов и команд
+
+        :return: boolean
+        """
+        protected = self._protected.get(enemy.id)
+        if protected is None:
+            guards = self.tracker.guards
+            if enemy.id in guards:
+                protected = any(drone.is_alive and 50 < self.distance(drone, enemy) <= 350
+                                for drone in guards[enemy.id])
+            else:
+                mothership = getattr(enemy, 'my_mothership', None)
+                protected = mothership is not None and enemy in guards.get(mothership.id, ()) \
+                    and 50 < self.distance(enemy, mothership) <= 300
+            self._protected[enemy.id] = protected
+        return protected
+
+    def unprotected_motherships(self):
+        """Живые вражеские базы без защиты, считаются один раз за тик
+
+        :return: motherships
+        """
+        if self._unprotected_motherships is None:
+            self._unprotected_motherships = [mothership for mothership in self.enemies['motherships']
+                                             if not self.is_protected(mothership)]
+        return self._unprotected_motherships
+
+    def loot_candidates(self):
+        """Вражеские обломки и непустые астероиды, отсортированные по удалению от нашей базы.
+        Трекер обновляется в начале тика, поэтому опустевшие с тех пор объекты отбрасываются
+
+        :return: objects
+        """
+        return [obj for obj in self.tracker.loot if obj.payload != 0]
+
+    def objects_with_elerium(self, shot_distance):
+        """Объекты с ресурсом вне зоны обстрела, отсортированные по удалению от нашей базы
+
+        :return: objects
+        """
+        if self._loot is None:
+            candidates = self.loot_candidates()
+            self.update_threats([obj for obj in candidates if obj.id not in self._on_fire], shot_distance)
+            self._loot = [obj for obj in candidates if not self._on_fire[obj.id]]
+        return self._loot
+
+    def update_threats(self, objects, shot_distance):
+        """Одним пакетом считаем угрозу для списка объектов и запоминаем результат на этот тик"""
+        under_fire, nearest = threat_matrix(self.enemies['drones'], objects, shot_distance)
+        for obj, on_fire, distance in zip(objects, under_fire, nearest):
+            self._on_fire[obj.id] = on_fire
+            self._threat_distances[obj.id] = distance
+
+    def threat_distance(self, obj, shot_distance):
+        """Расстояние от объекта до ближайшего живого вражеского дрона, None если врагов нет
+
+        :return: distance
+        """
+        if obj.id not in self._threat_distances:
+            self.update_threats([obj], shot_distance)
+        return self._threat_distances[obj.id]
+
+
+class FormationCache:
+    """LRU-кэш построений (точек защиты и нападения) со счётчиками попаданий и промахов
+
+    Построения хранятся кортежами точек, одни и те же точки отдаются всем дронам команды.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._formations = OrderedDict()
+
+    def __len__(self):
+        return len(self._formations)
+
+    def get(self, key, build):
+        """Возвращаем построение по ключу, при промахе строим его функцией build
+
+        :return: tuple of points
+        """
+        formation = self._formations.get(key)
+        if formation is not None:
+            self._formations.move_to_end(key)
+            self.hits += 1
+            return formation
+        self.misses += 1
+        formation = tuple(build())
+        self._formations[key] = formation
+        if len(self._formations) > self.maxsize:
+            self._formations.popitem(last=False)
+        return formation
+
+    def stats(self):
+        """Статистика кэша
+
+        :return: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._formations)}
+
+
+class TeamState:
+    """Общее состояние команды, разделяемое всеми её дронами"""
+
+    def __init__(self, scene, background=None, telemetry_path=None):
+        self.scene = scene
+        self.telemetry = TeamTelemetry(TelemetryWriter(telemetry_path) if telemetry_path else None)
+        self.planner = BackgroundPlanner(background) if background else None
+        self.snapshot = None
+        self.tracker = None
+        self.formations = FormationCache()
+        self.distance_matrix = None
+        self.assignment = TeamAssignment()
+        self.motion = EnemyMotion()
+        self.scheduler = DecisionScheduler()
+        self.decisions = {'hits': 0, 'misses': 0}
+
+    def get_tracker(self, drone):
+        """Возвращаем трекер состояния мира, создаём его при первом обращении
+
+        :return: tracker
+        """
+        if self.tracker is None:
+            self.tracker = WorldTracker(self.scene, drone.team, drone.my_mothership, drone.asteroids)
+        return self.tracker
+
+    def refresh_world(self, drone):
+        """Применяем к трекеру изменения мира и записываем положения противников, вызывается по сердцебиению.
+        С фоновым планировщиком заодно отдаём ему свежий мир, чтобы план не устаревал между решениями"""
+        tracker = self.get_tracker(drone)
+        if tracker.refresh(self.scene._step):
+            self.motion.record(self.scene._step, tracker.enemies['drones'])
+        if self.planner is not None:
+            self.get_snapshot(drone)
+
+    def get_snapshot(self, drone):
+        """Возвращаем снимок мира на текущий тик, при смене тика обновляем трекер и строим новый снимок,
+        чтобы погибшие в этом тике противники не попадали в угрозы и цели
+
+        :return: snapshot
+        """
+        tick = self.scene._step
+        if self.snapshot is None or self.snapshot.tick != tick:
+            tracker = self.get_tracker(drone)
+            if tracker.refresh(tick):
+                self.motion.record(tick, tracker.enemies['drones'])
+            self.snapshot = WorldSnapshot(drone, tick, tracker)
+            if self.planner is not None:
+                self.use_plan(self.snapshot, drone)
+        return self.snapshot
+
+    def use_plan(self, snapshot, drone):
+        """Подставляем в снимок последний готовый фоновый план и отдаём рабочему новый мир"""
+        plan = self.planner.get(snapshot.tick)
+        if plan is not None:
+            snapshot.plan = plan
+            snapshot._on_fire.update(plan.on_fire)
+        self.planner.submit(FrozenWorld(snapshot, drone.params, drone.formation_quantum, drone.field))
+
+    def close(self):
+        """Останавливаем фоновый планировщик и дописываем телеметрию"""
+        if self.planner is not None:
+            self.planner.close()
+        self.telemetry.close()
+
+    def stats(self):
+        """Статистика общих механизмов команды за игру
+
+        :return: dict
+        """
+        stats = {
+            'assignment': self.assignment.stats(),
+            'formations': self.formations.stats(),
+            'scheduler': self.scheduler.stats(),
+            'decisions': dict(self.decisions),
+        }
+        if self.planner is not None:
+            stats['planner'] = self.planner.stats()
+        return stats
+
+    def get_distance_matrix(self, drone):
+        """Возвращаем матрицу расстояний между астероидами и до нашей базы, строим её один раз
+
+        :return: distance_matrix
+        """
+        if self.distance_matrix is None:
+            self.distance_matrix = DistanceMatrix(drone.asteroids, drone.my_mothership)
+        return self.distance_matrix
+
+
+class DecisionContext:
+    """Значения проверок дрона, посчитанные в текущем тике
+
+    Каждая проверка считается лениво и не больше одного раза, все ветки выбора действия,
+    print_statistic и check_all_drones_on_mothership в этом тике получают одно и то же значение.
+    Попадания и промахи копятся в общем для команды словаре counters.
+    """
+
+    def __init__(self, tick, counters=None):
+        self.tick = tick
+        self.values = {}
+        self.counters = counters if counters is not None else {'hits': 0, 'misses': 0}
+
+    def get(self, key, compute):
+        """Возвращаем значение по ключу, при первом обращении считаем его функцией compute
+
+        :return: value
+        """
+        if key in self.values:
+            self.counters['hits'] += 1
+            return self.values[key]
+        self.counters['misses'] += 1
+        value = self.values[key] = compute()
+        return value
+
+
+def per_decision(method):
+    """Декоратор проверок дрона: результат запоминается в контексте решения на текущий тик.
+    Ключ - имя метода, my_id дрона и аргументы (объекты - по id).
+    Подходит только для проверок без побочных эффектов: повторный вызов не выполняет тело метода
+    """
+    @functools.wraps(method)
+    def wrapper(drone, *args):
+        key = (method.__name__, drone.my_id) + tuple(getattr(arg, 'id', arg) for arg in args)
+        return drone.get_context().get(key, lambda: method(drone, *args))
+    return wrapper
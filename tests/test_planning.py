@@ -0,0 +1,61 @@
+import itertools
+import math
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from pazukhin_planning import DistanceMatrix, min_cost_assignment, plan_route
+
+
+def brute_assignment_cost(cost):
+    n, m = len(cost), len(cost[0])
+    if n <= m:
+        return min(sum(cost[i][j] for i, j in enumerate(cols)) for cols in itertools.permutations(range(m), n))
+    return min(sum(cost[i][j] for j, i in enumerate(rows)) for rows in itertools.permutations(range(n), m))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_min_cost_assignment_matches_brute_force(seed):
+    rng = random.Random(seed)
+    n, m = rng.randint(1, 5), rng.randint(1, 5)
+    cost = [[rng.choice([rng.uniform(0, 1000), rng.randint(0, 3)]) for _ in range(m)] for _ in range(n)]
+    pairs = min_cost_assignment(cost)
+    assert len(pairs) == min(n, m)
+    assert len({row for row, _ in pairs}) == len(pairs)
+    assert len({col for _, col in pairs}) == len(pairs)
+    assert sum(cost[row][col] for row, col in pairs) == pytest.approx(brute_assignment_cost(cost))
+
+
+def test_min_cost_assignment_empty():
+    assert min_cost_assignment([]) == []
+    assert min_cost_assignment([[]]) == []
+
+
+def route_key(matrix, route, drone, free_space):
+    travelled = math.hypot(route[0].x - drone.x, route[0].y - drone.y)
+    travelled += sum(matrix.between(left, right) for left, right in zip(route, route[1:]))
+    total = travelled + matrix.base_distance(route[-1])
+    collected = sum(stone.payload for stone in route)
+    return (0, total) if collected >= free_space else (1, total / collected)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_plan_route_fills_to_capacity(seed):
+    rng = random.Random(seed)
+    base = SimpleNamespace(id=0, x=90, y=90)
+    stones = [SimpleNamespace(id=i + 1, x=rng.uniform(0, 1200), y=rng.uniform(0, 1200), payload=rng.randint(5, 60))
+              for i in range(rng.randint(1, 7))]
+    drone = SimpleNamespace(x=rng.uniform(0, 1200), y=rng.uniform(0, 1200))
+    free_space = rng.randint(20, 100)
+    matrix = DistanceMatrix(stones, base)
+    start = [math.hypot(stone.x - drone.x, stone.y - drone.y) for stone in stones]
+    route = plan_route(matrix, stones, start, free_space, max_stops=3)
+    routes = [candidate for stops in range(1, 4) for candidate in itertools.permutations(stones, stops)]
+    can_fill = any(sum(stone.payload for stone in candidate) >= free_space for candidate in routes)
+    assert route and len(set(stone.id for stone in route)) == len(route) <= 3
+    # Если трюм можно заполнить, маршрут его заполняет и он самый короткий среди заполняющих
+    assert (sum(stone.payload for stone in route) >= free_space) == can_fill
+    best = min(route_key(matrix, candidate, drone, free_space) for candidate in routes)
+    key = route_key(matrix, route, drone, free_space)
+    assert key[0] == best[0] and key[1] == pytest.approx(best[1])
@@ -0,0 +1,91 @@
+import random
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from pazukhin_recording import Recorder, Recording
+
+
+def make_object(obj_id, team, payload, max_payload, health):
+    return SimpleNamespace(id=obj_id, team=team, x=0.0, y=0.0, direction=0.0, payload=payload,
+                           free_space=max_payload - payload, health=health, is_alive=True)
+
+
+@pytest.fixture
+def theme(monkeypatch):
+    # Recorder берёт размер поля из темы движка, которой без запущенной сцены нет
+    theme = SimpleNamespace(FIELD_WIDTH=1200, FIELD_HEIGHT=900, DRONES_CAN_FIGHT=True)
+    monkeypatch.setitem(sys.modules, 'robogame_engine.theme', SimpleNamespace(theme=theme))
+    return theme
+
+
+def make_scene():
+    drones = [make_object(i + 1, 'TeamA' if i < 2 else 'TeamB', 0, 100, 100) for i in range(4)]
+    motherships = [make_object(10, 'TeamA', 0, 1000, 2000), make_object(11, 'TeamB', 0, 1000, 2000)]
+    asteroids = [make_object(20 + i, None, 150, 150, None) for i in range(3)]
+    return SimpleNamespace(_step=0, drones=drones, motherships=motherships, asteroids=asteroids)
+
+
+def test_round_trip(tmp_path, theme):
+    rng = random.Random(1)
+    scene = make_scene()
+    objects = scene.drones + scene.motherships + scene.asteroids
+    recorder = Recorder(str(tmp_path / 'match.pzr'), flush_every=3)
+    written = []
+    for tick in range(1, 11):
+        scene._step = tick * 2
+        for obj in objects:
+            obj.x, obj.y, obj.direction = rng.uniform(0, 1200), rng.uniform(0, 900), rng.uniform(0, 360)
+            obj.payload = rng.randint(0, 100)
+            obj.is_alive = rng.random() > 0.2
+        recorder.write(scene)
+        written.append((scene._step, [(obj.x, obj.y, obj.direction, obj.payload, obj.health or 0, obj.is_alive)
+                                      for obj in objects]))
+    recorder.close()
+
+    recording = Recording(str(tmp_path / 'match.pzr'))
+    try:
+        assert len(recording) == len(written)
+        assert recording.field == (1200, 900)
+        assert recording.meta['can_fight'] is True
+        assert recording.teams == ['TeamA', 'TeamB']
+        assert [description['id'] for description in recording.objects] == [obj.id for obj in objects]
+        assert [description['team'] for description in recording.objects] == [0, 0, 1, 1, 0, 1, -1, -1, -1]
+        for (tick, states), (expected_tick, expected_states) in zip(recording, written):
+            assert tick == expected_tick
+            for state, expected in zip(states, expected_states):
+                # Координаты и ресурс хранятся во float32
+                assert state[:5] == pytest.approx(expected[:5], rel=1e-6, abs=1e-3)
+                assert bool(state[5]) == expected[5]
+        assert recording.find(0) == 0
+        assert recording.find(7) == 3
+        assert recording.find(20) == 9
+        assert recording.find(21) == len(recording)
+    finally:
+        recording.close()
+
+
+def test_partial_record_is_ignored(tmp_path, theme):
+    scene = make_scene()
+    path = tmp_path / 'match.pzr'
+    recorder = Recorder(str(path))
+    for tick in range(3):
+        scene._step = tick
+        recorder.write(scene)
+    recorder.close()
+    # Матч ещё идёт: последняя запись дописана не целиком
+    with open(path, 'ab') as output:
+        output.write(b'\0' * 7)
+    recording = Recording(str(path))
+    try:
+        assert len(recording) == 3
+    finally:
+        recording.close()
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'NOPE' + b'\0' * 32)
+    with pytest.raises(ValueError):
+        Recording(str(path))
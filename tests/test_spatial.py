@@ -0,0 +1,81 @@
+import math
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from pazukhin_spatial import LinearIndex, UniformGrid, build_index
+
+
+def make_objects(rng, count, side):
+    return [SimpleNamespace(id=i, x=rng.uniform(0, side), y=rng.uniform(0, side), payload=rng.randint(0, 3))
+            for i in range(count)]
+
+
+def brute_nearest(objects, point, predicate=None, max_distance=None):
+    distances = [math.hypot(obj.x - point.x, obj.y - point.y) for obj in objects
+                 if predicate is None or predicate(obj)]
+    distances = [distance for distance in distances if max_distance is None or distance <= max_distance]
+    return min(distances) if distances else None
+
+
+def indexes(objects):
+    return [UniformGrid(objects), UniformGrid(objects, cell_size=40), UniformGrid.adaptive(objects),
+            LinearIndex(objects)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('count', [1, 10, 200])
+def test_nearest_matches_brute_force(seed, count):
+    rng = random.Random(seed)
+    side = 2000
+    objects = make_objects(rng, count, side)
+    for index in indexes(objects):
+        for _ in range(50):
+            # Точки и за пределами объектов, чтобы проверить поиск с края сетки
+            point = SimpleNamespace(x=rng.uniform(-300, side + 300), y=rng.uniform(-300, side + 300))
+            max_distance = rng.choice([None, 100, 500])
+            predicate = rng.choice([None, lambda obj: obj.payload > 0])
+            obj, distance = index.nearest(point, predicate, max_distance)
+            expected = brute_nearest(objects, point, predicate, max_distance)
+            if expected is None:
+                assert obj is None and distance is None
+            else:
+                assert distance == pytest.approx(expected)
+                assert math.hypot(obj.x - point.x, obj.y - point.y) == pytest.approx(expected)
+
+
+def test_nearest_after_objects_move():
+    rng = random.Random(7)
+    side = 1500
+    objects = make_objects(rng, 100, side)
+    grid = UniformGrid.adaptive(objects)
+    linear = LinearIndex(objects)
+    for _ in range(20):
+        for obj in rng.sample(objects, 30):
+            obj.x = min(max(obj.x + rng.uniform(-200, 200), 0), side)
+            obj.y = min(max(obj.y + rng.uniform(-200, 200), 0), side)
+            grid.update(obj)
+            linear.update(obj)
+        point = SimpleNamespace(x=rng.uniform(0, side), y=rng.uniform(0, side))
+        expected = brute_nearest(objects, point)
+        assert grid.nearest(point)[1] == pytest.approx(expected)
+        assert linear.nearest(point)[1] == pytest.approx(expected)
+    assert sum(len(cell) for cell in grid.cells.values()) == len(objects)
+
+
+def test_update_adds_new_objects():
+    rng = random.Random(3)
+    objects = make_objects(rng, 5, 1000)
+    for index in (UniformGrid.adaptive(objects[:3]), LinearIndex(objects[:3])):
+        assert not index.update(objects[0])
+        for obj in objects[3:]:
+            assert index.update(obj)
+        assert len(index) == len(objects)
+
+
+def test_build_index_threshold():
+    rng = random.Random(1)
+    assert isinstance(build_index(make_objects(rng, 10, 1000)), LinearIndex)
+    assert isinstance(build_index(make_objects(rng, 100, 1000)), UniformGrid)
+    assert isinstance(build_index(make_objects(rng, 10, 1000), threshold=5), UniformGrid)
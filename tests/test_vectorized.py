@@ -0,0 +1,60 @@
+import random
+from array import array
+from types import SimpleNamespace
+
+import pytest
+
+import pazukhin_vectorized as vectorized
+
+pytest.importorskip('numpy')
+
+
+def make_points(rng, count):
+    return [SimpleNamespace(x=rng.uniform(0, 1200), y=rng.uniform(0, 1200)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('block_size', [7, 1 << 20])
+def test_threat_matrix_numpy_matches_python(seed, block_size):
+    rng = random.Random(seed)
+    threats = make_points(rng, rng.randint(10, 30))
+    objects = make_points(rng, rng.randint(10, 40))
+    under_fire, nearest = vectorized.threat_matrix(threats, objects, 300, block_size=block_size)
+    expected_fire, expected_nearest = vectorized._threat_matrix_python(threats, objects, 300)
+    assert under_fire == expected_fire
+    assert nearest == pytest.approx(expected_nearest)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_estimate_velocities_numpy_matches_python(seed):
+    rng = random.Random(seed)
+    rows, history, lag = 8, 6, 3
+    positions = array('d', (rng.uniform(0, 1200) for _ in range(rows * history * 2)))
+    ticks = array('d', [0.0] * (rows * history))
+    # Разное число записей в строках: пустые, неполные и переполненные кольцевые буферы
+    cursors = array('q', (rng.randint(0, 3 * history) for _ in range(rows)))
+    for row in range(rows):
+        for count in range(cursors[row]):
+            ticks[row * history + count % history] = count * rng.choice([1, 5])
+    wanted = rng.sample(range(rows), rng.randint(1, rows))
+    result = vectorized.estimate_velocities(positions, ticks, cursors, wanted, history, lag)
+    expected = vectorized._estimate_velocities_python(positions, ticks, cursors, wanted, history, lag)
+    assert len(result) == len(expected)
+    for velocity, expected_velocity in zip(result, expected):
+        assert velocity == pytest.approx(expected_velocity)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_intercept_points_numpy_matches_python(seed):
+    rng = random.Random(seed)
+    shooters = [(rng.uniform(0, 1200), rng.uniform(0, 1200)) for _ in range(rng.randint(1, 6))]
+    targets = [(rng.uniform(0, 1200), rng.uniform(0, 1200)) for _ in range(rng.randint(1, 6))]
+    # Среди целей есть неподвижные и быстрее снаряда
+    velocities = [rng.choice([(0.0, 0.0), (rng.uniform(-4, 4), rng.uniform(-4, 4)), (15.0, -12.0)])
+                  for _ in targets]
+    result = vectorized.intercept_points(shooters, targets, velocities, 10, 60)
+    expected = vectorized._intercept_points_python(shooters, targets, velocities, 10, 60)
+    assert len(result) == len(expected)
+    for row, expected_row in zip(result, expected):
+        for point, expected_point in zip(row, expected_row):
+            assert point == pytest.approx(expected_point)